@@ -0,0 +1,267 @@
+import hashlib
+import json
+import os
+import threading
+from bson import ObjectId
+from db.conexion import get_db
+from db.ventas import filtro_fecha
+from analisis.exportacion_parquet import marca_de_instantanea
+
+DIRECTORIO_CACHE = os.path.join(os.path.expanduser("~"), ".supermercado", "analisis")
+
+# Cambia si cambia el formato del resultado: invalida lo guardado con el anterior
+VERSION_CACHE = 1
+
+# Por encima de este número de tickets nuevos sale más a cuenta recalcular todo
+MAXIMO_DELTA = 50_000
+
+
+def marca_de_datos(db, inicio=None, fin=None):
+    """Marca de agua de los tickets del periodo: cantidad, mayor _id y mayor fecha"""
+    filtro = filtro_fecha(inicio, fin)
+    coleccion = db["clientes"]
+    if not filtro:
+        # Sin periodo, cada dato sale de un extremo de su índice
+        ultimo_id = next(coleccion.find({}, {"_id": 1}).sort("_id", -1).limit(1), None)
+        ultima_fecha = next(coleccion.find({}, {"fecha": 1}).sort("fecha", -1).limit(1), None)
+        return {
+            'documentos': coleccion.estimated_document_count(),
+            'max_id': str(ultimo_id["_id"]) if ultimo_id else None,
+            'max_fecha': ultima_fecha["fecha"].isoformat() if ultima_fecha else None,
+        }
+    # Con periodo, una sola pasada cubierta por el índice (fecha, _id): ordenar por _id
+    # con el filtro de fecha obligaría a leer los documentos del periodo. Sin hint: la
+    # migración que crea el índice corre en segundo plano y puede no haber terminado
+    filas = list(coleccion.aggregate([
+        {"$match": filtro},
+        {"$project": {"_id": 1, "fecha": 1}},
+        {"$group": {"_id": None, "documentos": {"$sum": 1},
+                    "max_id": {"$max": "$_id"}, "max_fecha": {"$max": "$fecha"}}},
+    ]))
+    fila = filas[0] if filas else {}
+    return {
+        'documentos': fila.get('documentos', 0),
+        'max_id': str(fila['max_id']) if fila.get('max_id') else None,
+        'max_fecha': fila['max_fecha'].isoformat() if fila.get('max_fecha') else None,
+    }
+
+
+class CacheResultados:
+    """Resultados estructurados del análisis en disco, uno por combinación de parámetros"""
+
+    def __init__(self, directorio=DIRECTORIO_CACHE):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    def _ruta(self, parametros):
+        clave = json.dumps(parametros, sort_keys=True, default=str)
+        return os.path.join(self.directorio, hashlib.sha1(clave.encode("utf-8")).hexdigest() + ".json")
+
+    def leer(self, parametros):
+        """Entrada guardada ({marca, resultado}) o None si no hay o no se puede leer"""
+        try:
+            with open(self._ruta(parametros), encoding="utf-8") as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entrada.get('version') != VERSION_CACHE or entrada.get('parametros') != json.loads(
+                json.dumps(parametros, default=str)):
+            return None
+        return entrada
+
+    def guardar(self, parametros, marca, resultado):
+        ruta = self._ruta(parametros)
+        temporal = ruta + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            json.dump({
+                'version': VERSION_CACHE,
+                'parametros': parametros,
+                'marca': marca,
+                'resultado': resultado,
+            }, f, ensure_ascii=False, default=str)
+        # Reemplazo atómico: nunca queda un fichero a medio escribir
+        os.replace(temporal, ruta)
+
+
+def es_completo(resultado):
+    return not resultado.get('cancelado') and all(
+        s.get('estado') == "completa" for s in resultado.get('secciones') or [])
+
+
+def combinar(base, delta, clientes_actualizados):
+    """Suma al resultado guardado el de los tickets nuevos.
+
+    clientes_actualizados trae el gasto total (histórico + nuevo) de cada cliente con tickets
+    nuevos; los demás no cambiaron, así que el top se rehace con ellos y el top anterior.
+    """
+    resultado = dict(base)
+    resultado['fecha_analisis'] = delta['fecha_analisis']
+    resultado['motor'] = delta.get('motor')
+    resultado['total_registros'] = base['total_registros'] + delta['total_registros']
+
+    fechas_min = [f for f in (base.get('fecha_min'), delta.get('fecha_min')) if f]
+    fechas_max = [f for f in (base.get('fecha_max'), delta.get('fecha_max')) if f]
+    resultado['fecha_min'] = min(fechas_min) if fechas_min else None
+    resultado['fecha_max'] = max(fechas_max) if fechas_max else None
+
+    if base.get('ventas_por_dia') is not None:
+        por_dia = {dia: dict(datos) for dia, datos in base['ventas_por_dia'].items()}
+        for dia, datos in (delta.get('ventas_por_dia') or {}).items():
+            acumulado = por_dia.setdefault(dia, {'total': 0, 'ventas': 0, 'clientes': 0})
+            for campo in ('total', 'ventas', 'clientes'):
+                acumulado[campo] += datos[campo]
+        resultado['ventas_por_dia'] = por_dia
+
+    if base.get('productos') is not None:
+        productos = {nombre: dict(datos) for nombre, datos in base['productos'].items()}
+        for nombre, datos in (delta.get('productos') or {}).items():
+            acumulado = productos.setdefault(nombre, {'unidades': 0, 'ingresos': 0})
+            acumulado['unidades'] += datos['unidades']
+            acumulado['ingresos'] += datos['ingresos']
+        resultado['productos'] = productos
+
+    if base.get('estadisticas') is not None and delta.get('estadisticas') is not None:
+        a, b = base['estadisticas'], delta['estadisticas']
+        extremos_max = [v for v in (a['maxima'], b['maxima']) if v is not None]
+        extremos_min = [v for v in (a['minima'], b['minima']) if v is not None]
+        resultado['estadisticas'] = {
+            'ventas': a['ventas'] + b['ventas'],
+            'con_total': a['con_total'] + b['con_total'],
+            'ingresos': a['ingresos'] + b['ingresos'],
+            'maxima': max(extremos_max) if extremos_max else None,
+            'minima': min(extremos_min) if extremos_min else None,
+        }
+
+    if base.get('clientes') is not None:
+        nombres = {c['nombre'] for c in clientes_actualizados}
+        candidatos = [c for c in base['clientes'] if c['nombre'] not in nombres] + clientes_actualizados
+        resultado['clientes'] = sorted(candidatos, key=lambda c: -c['gasto'])[:10]
+
+    resultado['secciones'] = delta.get('secciones', [])
+    return resultado
+
+
+def gasto_de_clientes(db, nombres, inicio=None, fin=None, hasta_id=None):
+    """Gasto y compras totales del periodo de los clientes indicados (usa el índice 'nombre')"""
+    filtro = filtro_fecha(inicio, fin)
+    filtro['nombre'] = {'$in': list(nombres)}
+    if hasta_id is not None:
+        filtro['_id'] = {'$lte': hasta_id}
+    return [
+        {'nombre': fila['_id'], 'gasto': fila['gasto'], 'compras': fila['compras']}
+        for fila in db["clientes"].aggregate([
+            {'$match': filtro},
+            {'$group': {'_id': '$nombre', 'gasto': {'$sum': '$total'}, 'compras': {'$sum': 1}}},
+        ])
+    ]
+
+
+class AnalisisConCache:
+    """Ejecuta el análisis con un motor, reutilizando el resultado guardado de los mismos
+    parámetros: idéntico si los datos no cambiaron, o sumándole sólo los tickets nuevos"""
+
+    def __init__(self, crear_motor, inicio=None, fin=None, campos=None, cache=None, fuente="mongo",
+                 motor="auto"):
+        # crear_motor(inicio=, fin=, campos=, desde_id=, hasta_id=) devuelve un motor con
+        # analizar() y cancelar() que lee de 'fuente'; 'motor' es el que se eligió para crearlo
+        self.crear_motor = crear_motor
+        self.fuente = fuente
+        self.motor = motor
+        self.inicio = inicio
+        self.fin = fin
+        self.campos = campos
+        self.cache = cache or CacheResultados()
+        self._lock = threading.Lock()
+        self._motor = None
+        self._cancelado = False
+
+    def parametros(self):
+        return {
+            'inicio': self.inicio.isoformat() if self.inicio else None,
+            'fin': self.fin.isoformat() if self.fin else None,
+            'campos': sorted(self.campos) if self.campos else None,
+            'fuente': self.fuente,
+            # Un motor elegido a mano tiene su propia entrada: quien pide Spark no recibe
+            # el resultado guardado por NumPy
+            'motor': self.motor,
+        }
+
+    def cancelar(self):
+        with self._lock:
+            self._cancelado = True
+            motor = self._motor
+        if motor is not None:
+            motor.cancelar()
+
+    def _ejecutar(self, marca, desde_id, progreso, parcial, detalle):
+        # Hasta el mayor _id de la marca: lo que llegue durante el análisis queda para el siguiente
+        hasta_id = ObjectId(marca['max_id']) if marca and marca['max_id'] else None
+        argumentos = {'inicio': self.inicio, 'fin': self.fin, 'desde_id': desde_id, 'hasta_id': hasta_id}
+        if self.campos:
+            argumentos['campos'] = self.campos
+        with self._lock:
+            self._motor = self.crear_motor(**argumentos)
+            if self._cancelado:
+                self._motor.cancelar()
+        return self._motor.analizar(progreso=progreso, parcial=parcial, detalle=detalle)
+
+    def analizar(self, progreso=None, parcial=None, detalle=None):
+        parametros = self.parametros()
+        try:
+            if self.fuente == "parquet":
+                # La instantánea sólo cambia al exportar: su marca basta y no se consulta MongoDB
+                marca = marca_de_instantanea()
+            else:
+                db = get_db()
+                marca = marca_de_datos(db, self.inicio, self.fin)
+            entrada = self.cache.leer(parametros)
+        except Exception as e:
+            # Sin base o sin disco se analiza como siempre, sin caché
+            print("No se pudo consultar la caché del análisis:", e)
+            return self._ejecutar(None, None, progreso, parcial, detalle)
+
+        if entrada is not None and entrada['marca'] == marca:
+            resultado = dict(entrada['resultado'])
+            resultado['cache'] = {'tipo': "completo", 'calculado': entrada['resultado']['fecha_analisis']}
+            return resultado
+
+        anterior = entrada['marca'] if entrada else None
+        # El delta se calcula contra 'clientes': con la instantánea se recalcula el periodo entero
+        if (self.fuente == "mongo" and anterior and anterior['max_id']
+                and marca['documentos'] > anterior['documentos']):
+            desde_id = ObjectId(anterior['max_id'])
+            filtro = filtro_fecha(self.inicio, self.fin)
+            filtro['_id'] = {'$gt': desde_id, '$lte': ObjectId(marca['max_id'])}
+            nuevos = db["clientes"].count_documents(filtro)
+            # Sólo si todo lo que cambió son tickets con _id posterior (sin borrados ni
+            # tickets antiguos subidos tarde desde un diario local) se puede sumar el delta
+            if nuevos == marca['documentos'] - anterior['documentos'] and nuevos <= MAXIMO_DELTA:
+                # Los parciales del delta no son el resultado del periodo: no se muestran
+                delta = self._ejecutar(marca, desde_id, progreso, None, detalle)
+                if not es_completo(delta):
+                    # Se muestra lo guardado, avisando de que no incluye los tickets nuevos
+                    resultado = dict(entrada['resultado'])
+                    resultado['cancelado'] = delta['cancelado']
+                    resultado['secciones'] = delta['secciones']
+                    resultado['cache'] = {'tipo': "anterior", 'calculado': entrada['resultado']['fecha_analisis']}
+                    return resultado
+                clientes = []
+                if entrada['resultado'].get('clientes') is not None:
+                    nombres = db["clientes"].distinct("nombre", filtro)
+                    clientes = gasto_de_clientes(db, nombres, self.inicio, self.fin, ObjectId(marca['max_id']))
+                resultado = combinar(entrada['resultado'], delta, clientes)
+                self._guardar(parametros, marca, resultado)
+                resultado = dict(resultado)
+                resultado['cache'] = {'tipo': "incremental", 'nuevos': nuevos}
+                return resultado
+
+        resultado = self._ejecutar(marca, None, progreso, parcial, detalle)
+        if es_completo(resultado):
+            self._guardar(parametros, marca, resultado)
+        return resultado
+
+    def _guardar(self, parametros, marca, resultado):
+        try:
+            self.cache.guardar(parametros, marca, resultado)
+        except OSError as e:
+            print("No se pudo guardar el análisis en caché:", e)
@@ -0,0 +1,327 @@
+"""Instantánea columnar de 'clientes' en un dataset Parquet local, particionado por día.
+
+Dos tablas con particiones Hive (dia=AAAA-MM-DD):
+    tickets/  un registro por ticket: _id, nombre, total, fecha
+    lineas/   un registro por producto vendido: ticket_id, fecha, nombre, precio, cantidad, importe
+
+La exportación es incremental: lee de MongoDB los tickets con _id posterior al de la marca
+(marca.json) y, además, vuelve a exportar enteros los últimos DIAS_REVISION días, porque un
+ticket subido tarde desde el diario de un terminal trae un _id anterior a la marca. Cada
+exportación es una generación: sus ficheros llevan el número en el nombre, los de días
+reexportados sustituyen a los anteriores y, si se interrumpe, los de la generación que no
+llegó a la marca se borran al empezar la siguiente, así que nunca queda un ticket repetido.
+
+Al terminar se compara con 'clientes': si faltan tickets (subidos más tarde que la ventana)
+la marca queda como obsoleta y los motores se niegan a leer el dataset hasta rehacerlo.
+
+Uso desde la raíz del proyecto:
+    python -m analisis.exportacion_parquet              # tickets nuevos desde la marca
+    python -m analisis.exportacion_parquet --dias 7     # reexportando la última semana
+    python -m analisis.exportacion_parquet --completo   # borra el dataset y exporta todo
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import shutil
+from bson import ObjectId
+from db.conexion import get_db
+
+DIRECTORIO_PARQUET = os.path.join(os.path.expanduser("~"), ".supermercado", "parquet")
+TABLA_TICKETS = "tickets"
+TABLA_LINEAS = "lineas"
+FICHERO_MARCA = "marca.json"
+
+# Tickets leídos de MongoDB y escritos en cada lote
+TAMANO_LOTE = 100_000
+
+# Días anteriores a la última fecha exportada que se vuelven a exportar en cada ejecución
+DIAS_REVISION = 3
+
+_NOMBRE_FICHERO = re.compile(r"^gen-(\d+)-\d+-\d+\.parquet$")
+_DIA = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as e:
+        raise Exception(f"El dataset Parquet necesita pyarrow instalado: {str(e)}")
+    return pyarrow, pyarrow.dataset
+
+
+def ruta_tabla(tabla, directorio=DIRECTORIO_PARQUET):
+    return os.path.join(directorio, tabla)
+
+
+def _particion(pa, ds):
+    return ds.partitioning(pa.schema([("dia", pa.string())]), flavor="hive")
+
+
+def _esquemas(pa):
+    tickets = pa.schema([
+        ("_id", pa.string()),
+        ("nombre", pa.string()),
+        ("total", pa.float64()),
+        ("fecha", pa.timestamp("ms")),
+        ("dia", pa.string()),
+    ])
+    lineas = pa.schema([
+        ("ticket_id", pa.string()),
+        ("fecha", pa.timestamp("ms")),
+        ("nombre", pa.string()),
+        ("precio", pa.float64()),
+        ("cantidad", pa.int64()),
+        ("importe", pa.float64()),
+        ("dia", pa.string()),
+    ])
+    return tickets, lineas
+
+
+def leer_marca(directorio=DIRECTORIO_PARQUET):
+    """Marca de la última exportación ({generacion, max_id, max_fecha, documentos, obsoleta,
+    actualizado}) o None"""
+    try:
+        with open(os.path.join(directorio, FICHERO_MARCA), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def marca_de_instantanea(directorio=DIRECTORIO_PARQUET):
+    """Marca de agua de los datos exportados, con el formato de marca_de_datos()"""
+    marca = leer_marca(directorio) or {}
+    return {
+        'documentos': marca.get('documentos', 0),
+        'max_id': marca.get('max_id'),
+        'max_fecha': marca.get('max_fecha'),
+        # Reexportar días cambia el contenido sin cambiar necesariamente los totales
+        'generacion': marca.get('generacion'),
+        'obsoleta': marca.get('obsoleta', False),
+    }
+
+
+def comprobar_instantanea(directorio=DIRECTORIO_PARQUET):
+    """Lanza una excepción si la última exportación no cuadró con 'clientes'"""
+    if (leer_marca(directorio) or {}).get('obsoleta'):
+        raise Exception("La instantánea Parquet no cuadra con 'clientes' (hay tickets subidos tarde "
+                        "que no incluye): ejecuta python -m analisis.exportacion_parquet --completo "
+                        "o analiza desde MongoDB")
+
+
+def _guardar_marca(directorio, marca):
+    ruta = os.path.join(directorio, FICHERO_MARCA)
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(marca, f)
+    # Reemplazo atómico: la marca siempre describe ficheros ya escritos
+    os.replace(temporal, ruta)
+
+
+def _ficheros(directorio):
+    """(ruta, dia, generacion) de cada fichero de lote de las dos tablas"""
+    for tabla in (TABLA_TICKETS, TABLA_LINEAS):
+        for raiz, _, ficheros in os.walk(ruta_tabla(tabla, directorio)):
+            dia = os.path.basename(raiz).partition("=")[2]
+            for fichero in ficheros:
+                coincidencia = _NOMBRE_FICHERO.match(fichero)
+                if coincidencia:
+                    yield os.path.join(raiz, fichero), dia, int(coincidencia.group(1))
+
+
+def _borrar_posteriores(directorio, generacion):
+    """Borra los ficheros de generaciones posteriores a la marca (de una exportación interrumpida)"""
+    borrados = 0
+    for ruta, _, de_generacion in _ficheros(directorio):
+        if de_generacion > generacion:
+            os.remove(ruta)
+            borrados += 1
+    return borrados
+
+
+def _borrar_sustituidos(directorio, generacion, desde_dia):
+    """Borra los ficheros anteriores a 'generacion' de los días reexportados (desde_dia en adelante)"""
+    for ruta, dia, de_generacion in _ficheros(directorio):
+        # 'sin_fecha' no es un día: sus tickets sólo llegan por _id y nunca se reexportan
+        if de_generacion < generacion and _DIA.match(dia) and dia >= desde_dia:
+            os.remove(ruta)
+
+
+def _tablas(pa, clientes):
+    """Tablas de tickets y de líneas de un lote de documentos de 'clientes'"""
+    esquema_tickets, esquema_lineas = _esquemas(pa)
+    tickets = {campo: [] for campo in esquema_tickets.names}
+    lineas = {campo: [] for campo in esquema_lineas.names}
+    for cliente in clientes:
+        fecha = cliente.get("fecha")
+        if not isinstance(fecha, datetime.datetime):
+            fecha = None
+        dia = fecha.strftime("%Y-%m-%d") if fecha else "sin_fecha"
+        ticket_id = str(cliente["_id"])
+        tickets["_id"].append(ticket_id)
+        tickets["nombre"].append(cliente.get("nombre"))
+        tickets["total"].append(cliente.get("total"))
+        tickets["fecha"].append(fecha)
+        tickets["dia"].append(dia)
+        for producto in cliente.get("productos") or ():
+            precio, cantidad = producto.get("precio"), producto.get("cantidad")
+            lineas["ticket_id"].append(ticket_id)
+            lineas["fecha"].append(fecha)
+            lineas["nombre"].append(producto.get("nombre"))
+            lineas["precio"].append(precio)
+            lineas["cantidad"].append(cantidad)
+            lineas["importe"].append(precio * cantidad if precio is not None and cantidad is not None else None)
+            lineas["dia"].append(dia)
+    return (pa.Table.from_pydict(tickets, schema=esquema_tickets),
+            pa.Table.from_pydict(lineas, schema=esquema_lineas))
+
+
+def exportar(db=None, directorio=DIRECTORIO_PARQUET, completo=False, verbose=False,
+             dias_revision=DIAS_REVISION):
+    """Añade al dataset los tickets posteriores a la marca y reexporta los últimos días;
+    devuelve cuántos tickets escribió"""
+    pa, ds = _pyarrow()
+    db = db if db is not None else get_db()
+    marca = leer_marca(directorio)
+    # Un dataset sin generaciones es del formato anterior: se rehace entero
+    if completo or (marca is not None and 'generacion' not in marca):
+        for tabla in (TABLA_TICKETS, TABLA_LINEAS):
+            shutil.rmtree(ruta_tabla(tabla, directorio), ignore_errors=True)
+        if os.path.exists(os.path.join(directorio, FICHERO_MARCA)):
+            os.remove(os.path.join(directorio, FICHERO_MARCA))
+        marca = None
+    os.makedirs(directorio, exist_ok=True)
+
+    marca = marca or {'generacion': 0, 'max_id': None, 'max_fecha': None, 'documentos': 0}
+    _borrar_posteriores(directorio, marca['generacion'])
+    generacion = marca['generacion'] + 1
+
+    filtro, desde_dia = {}, None
+    if marca['max_id']:
+        condiciones = [{"_id": {"$gt": ObjectId(marca['max_id'])}}]
+        if marca['max_fecha']:
+            ultima = datetime.datetime.fromisoformat(marca['max_fecha'])
+            desde = datetime.datetime.combine(ultima.date(), datetime.time())
+            desde -= datetime.timedelta(days=dias_revision)
+            desde_dia = desde.strftime("%Y-%m-%d")
+            condiciones.append({"fecha": {"$gte": desde}})
+        # Cada rama usa su índice (_id y fecha)
+        filtro = {"$or": condiciones} if len(condiciones) > 1 else condiciones[0]
+    particion = _particion(pa, ds)
+
+    nueva = {'generacion': generacion, 'max_id': marca['max_id'], 'max_fecha': marca['max_fecha']}
+    exportados = 0
+    lote = []
+    cursor = db["clientes"].find(filtro, {"nombre": 1, "total": 1, "fecha": 1, "productos": 1},
+                                 batch_size=10_000)
+    with cursor:
+        for cliente in cursor:
+            lote.append(cliente)
+            if len(lote) == TAMANO_LOTE:
+                _escribir_lote(pa, ds, particion, directorio, nueva, exportados // TAMANO_LOTE, lote)
+                exportados += len(lote)
+                lote = []
+                if verbose:
+                    print(f"⏳ {exportados} tickets exportados...")
+        if lote:
+            _escribir_lote(pa, ds, particion, directorio, nueva, exportados // TAMANO_LOTE, lote)
+            exportados += len(lote)
+
+    # Si se interrumpe aquí, la marca sigue en la generación anterior y la siguiente
+    # exportación vuelve a empezar desde ella
+    if desde_dia is not None:
+        _borrar_sustituidos(directorio, generacion, desde_dia)
+    nueva['documentos'] = _contar(pa, ds, directorio)
+
+    # Un ticket subido tarde con fecha anterior a la ventana sigue faltando: la marca lo
+    # registra para que nadie analice un dataset incompleto
+    en_mongo = db["clientes"].count_documents(
+        {"_id": {"$lte": ObjectId(nueva['max_id'])}}) if nueva['max_id'] else 0
+    nueva['obsoleta'] = nueva['documentos'] != en_mongo
+    if nueva['obsoleta']:
+        print(f"⚠️ El dataset tiene {nueva['documentos']} tickets y 'clientes' {en_mongo}: queda "
+              f"marcado como obsoleto; ejecuta la exportación con --completo para rehacerlo")
+    nueva['actualizado'] = datetime.datetime.now().isoformat(timespec="seconds")
+    _guardar_marca(directorio, nueva)
+    return exportados
+
+
+def _escribir_lote(pa, ds, particion, directorio, marca, numero, lote):
+    tickets, lineas = _tablas(pa, lote)
+    for tabla, datos in ((TABLA_TICKETS, tickets), (TABLA_LINEAS, lineas)):
+        ds.write_dataset(datos, ruta_tabla(tabla, directorio), format="parquet",
+                         partitioning=particion,
+                         basename_template=f"gen-{marca['generacion']}-{numero}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore")
+    fechas = [c["fecha"] for c in lote if isinstance(c.get("fecha"), datetime.datetime)]
+    if fechas:
+        ultima = max(fechas).isoformat()
+        marca['max_fecha'] = max(marca['max_fecha'] or ultima, ultima)
+    # Los _id en hexadecimal se ordenan igual que los ObjectId
+    ultimo_id = max(str(c["_id"]) for c in lote)
+    marca['max_id'] = max(marca['max_id'] or ultimo_id, ultimo_id)
+
+
+def _contar(pa, ds, directorio):
+    """Tickets del dataset (sólo lee los metadatos de los ficheros)"""
+    ruta = ruta_tabla(TABLA_TICKETS, directorio)
+    if not os.path.isdir(ruta):
+        return 0
+    return ds.dataset(ruta, format="parquet", partitioning=_particion(pa, ds)).count_rows()
+
+
+def filtro_parquet(inicio=None, fin=None, desde_id=None, hasta_id=None, campo_id="_id"):
+    """Expresión de pyarrow del periodo [inicio, fin) y del rango de _id; None si no filtra.
+
+    Las condiciones sobre 'dia' descartan particiones enteras sin abrir sus ficheros.
+    """
+    pa, ds = _pyarrow()
+    condiciones = []
+    if inicio is not None:
+        condiciones.append(ds.field("dia") >= inicio.strftime("%Y-%m-%d"))
+        condiciones.append(ds.field("fecha") >= pa.scalar(inicio, pa.timestamp("ms")))
+    if fin is not None:
+        ultimo_dia = fin - datetime.timedelta(microseconds=1)
+        condiciones.append(ds.field("dia") <= ultimo_dia.strftime("%Y-%m-%d"))
+        condiciones.append(ds.field("fecha") < pa.scalar(fin, pa.timestamp("ms")))
+    # Los _id en hexadecimal se ordenan igual que los ObjectId
+    if desde_id is not None:
+        condiciones.append(ds.field(campo_id) > str(desde_id))
+    if hasta_id is not None:
+        condiciones.append(ds.field(campo_id) <= str(hasta_id))
+    expresion = None
+    for condicion in condiciones:
+        expresion = condicion if expresion is None else expresion & condicion
+    return expresion
+
+
+def abrir_tabla(tabla, directorio=DIRECTORIO_PARQUET):
+    """Dataset de pyarrow de una de las tablas exportadas"""
+    pa, ds = _pyarrow()
+    ruta = ruta_tabla(tabla, directorio)
+    if not os.path.isdir(ruta):
+        raise Exception(f"No hay datos exportados en {ruta}: ejecuta python -m analisis.exportacion_parquet")
+    comprobar_instantanea(directorio)
+    return ds.dataset(ruta, format="parquet", partitioning=_particion(pa, ds))
+
+
+def contar_tickets(inicio=None, fin=None, desde_id=None, directorio=DIRECTORIO_PARQUET):
+    """Tickets exportados del periodo: sólo abre las particiones y columnas del filtro"""
+    return abrir_tabla(TABLA_TICKETS, directorio).count_rows(filter=filtro_parquet(inicio, fin, desde_id))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exportación de 'clientes' a Parquet particionado por día")
+    parser.add_argument("--directorio", default=DIRECTORIO_PARQUET, help="carpeta del dataset")
+    parser.add_argument("--completo", action="store_true", help="borrar el dataset y exportar todo")
+    parser.add_argument("--dias", type=int, default=DIAS_REVISION,
+                        help="días recientes que se vuelven a exportar")
+    args = parser.parse_args()
+
+    nuevos = exportar(directorio=args.directorio, completo=args.completo, verbose=True,
+                      dias_revision=args.dias)
+    marca = leer_marca(args.directorio) or {}
+    print(f"✅ {nuevos} tickets exportados. Total en el dataset: {marca.get('documentos', 0)} "
+          f"(hasta _id {marca.get('max_id')}, generación {marca.get('generacion')})")
@@ -0,0 +1,177 @@
+import uuid
+from pymongo.errors import ExecutionTimeout, PyMongoError
+from db.conexion import get_db
+from analisis.motores import MotorBase, TOTAL_PASOS, EXCEDIDA, FUENTE_MONGO
+
+
+class MotorMongo(MotorBase):
+    """Análisis dentro de MongoDB: cada sección es un pipeline de agregación sobre 'clientes',
+    así que sólo viajan los resultados agregados, no los tickets"""
+
+    nombre = "mongo"
+    temporizador_seccion = False
+
+    def __init__(self, **argumentos):
+        super().__init__(**argumentos)
+        if self.fuente != FUENTE_MONGO:
+            raise ValueError("El motor 'mongo' sólo puede leer de MongoDB")
+        self.db = None
+        # Cada agregación lleva este comentario más la sección: así se localiza para killOp
+        self._prefijo_comentario = f"analisis-{uuid.uuid4().hex[:8]}"
+
+    def _interrumpir(self, motivo):
+        seccion = self._seccion_en_curso
+        if not super()._interrumpir(motivo):
+            return False
+        comentario = f"{self._prefijo_comentario}-{seccion}"
+        try:
+            operaciones = self.db.client.admin.aggregate([
+                {'$currentOp': {}},
+                {'$match': {'command.comment': comentario}},
+            ])
+            for operacion in operaciones:
+                self.db.client.admin.command("killOp", op=operacion['opid'])
+        except PyMongoError as e:
+            # Sin permisos para killOp la sección termina sola; su resultado se descarta
+            print("No se pudo interrumpir la agregación:", e)
+        return True
+
+    def _agregar(self, clave, etapas):
+        """Ejecuta el pipeline de la sección tras el filtro del periodo, con su límite de tiempo"""
+        pipeline = []
+        filtro = self.filtro_lectura()
+        if filtro:
+            pipeline.append({'$match': filtro})
+        pipeline += etapas
+        opciones = {'allowDiskUse': True, 'comment': f"{self._prefijo_comentario}-{clave}"}
+        if self.presupuestos.get(clave):
+            # El propio servidor corta la agregación al agotar el límite
+            opciones['maxTimeMS'] = int(self.presupuestos[clave] * 1000)
+        return list(self.db[self.coleccion].aggregate(pipeline, **opciones))
+
+    def _estado_tras_error(self, clave, error):
+        # maxTimeMS agotado: el servidor cortó la sección por su límite
+        if isinstance(error, ExecutionTimeout) and self._interrupcion is None:
+            return EXCEDIDA
+        return super()._estado_tras_error(clave, error)
+
+    def analizar(self, progreso=None, parcial=None, detalle=None):
+        """Devuelve el resultado estructurado del análisis (ver analisis/reporte.py)
+
+        Mismos callbacks que MotorSpark salvo detalle, que no se usa: MongoDB no informa del
+        avance de una agregación.
+        """
+        self._progreso = progreso or (lambda paso, total, mensaje: None)
+        parcial = parcial or (lambda resultado: None)
+        self._secciones = []
+
+        self._progreso(1, TOTAL_PASOS, "Conectando con MongoDB...")
+        self.db = get_db()
+        if self.db is None:
+            raise Exception("Error al conectar con MongoDB")
+
+        resultado = self._nuevo_resultado()
+        datos = {}
+        campos = self.campos
+
+        def carga():
+            # No hay nada que traer: basta comprobar que el periodo tiene tickets
+            filtro = self.filtro_lectura()
+            opciones = {'comment': f"{self._prefijo_comentario}-carga"}
+            if self.presupuestos.get("carga"):
+                opciones['maxTimeMS'] = int(self.presupuestos["carga"] * 1000)
+            try:
+                datos['tickets'] = self.db[self.coleccion].count_documents(filtro, **opciones)
+            except PyMongoError as e:
+                if self._interrupcion is not None or isinstance(e, ExecutionTimeout):
+                    raise
+                raise Exception(f"Error al cargar datos: {str(e)}")
+
+        def metricas():
+            filas = self._agregar("metricas", [{'$facet': {
+                'registros': [{'$count': 'n'}],
+                'rango': [
+                    {'$match': {'fecha': {'$type': 'date'}}},
+                    {'$group': {'_id': None, 'fecha_min': {'$min': '$fecha'}, 'fecha_max': {'$max': '$fecha'}}},
+                ],
+                'totales': [
+                    {'$match': {'total': {'$ne': None}}},
+                    {'$group': {
+                        '_id': None,
+                        'con_total': {'$sum': 1},
+                        'ingresos': {'$sum': '$total'},
+                        'maxima': {'$max': '$total'},
+                        'minima': {'$min': '$total'},
+                    }},
+                ],
+            }}])
+            facetas = filas[0] if filas else {}
+            registros = facetas.get('registros') or [{'n': 0}]
+            resultado['total_registros'] = registros[0]['n']
+            if "fecha" in campos and facetas.get('rango'):
+                rango = facetas['rango'][0]
+                resultado['fecha_min'] = rango['fecha_min'].date().isoformat()
+                resultado['fecha_max'] = rango['fecha_max'].date().isoformat()
+            if "total" in campos:
+                totales = (facetas.get('totales') or [{}])[0]
+                resultado['estadisticas'] = {
+                    'ventas': resultado['total_registros'],
+                    'con_total': totales.get('con_total', 0),
+                    'ingresos': totales.get('ingresos', 0),
+                    'maxima': totales.get('maxima'),
+                    'minima': totales.get('minima'),
+                }
+
+        def ventas_por_dia():
+            if "fecha" in campos and "total" in campos:
+                # 'fecha' guarda la hora local tal cual: el día en UTC es el día local
+                filas = self._agregar("ventas_por_dia", [
+                    {'$match': {'fecha': {'$type': 'date'}}},
+                    {'$group': {
+                        '_id': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$fecha'}},
+                        'total': {'$sum': '$total'},
+                        'ventas': {'$sum': 1},
+                        'clientes': {'$sum': {'$cond': [{'$eq': [{'$ifNull': ['$nombre', None]}, None]}, 0, 1]}},
+                    }},
+                ])
+                resultado['ventas_por_dia'] = {
+                    fila['_id']: {'total': fila['total'], 'ventas': fila['ventas'], 'clientes': fila['clientes']}
+                    for fila in filas
+                }
+
+        def productos():
+            if "productos" in campos:
+                filas = self._agregar("productos", [
+                    {'$unwind': '$productos'},
+                    {'$group': {
+                        '_id': '$productos.nombre',
+                        'unidades': {'$sum': '$productos.cantidad'},
+                        'ingresos': {'$sum': {'$multiply': ['$productos.precio', '$productos.cantidad']}},
+                    }},
+                ])
+                resultado['productos'] = {
+                    fila['_id']: {'unidades': fila['unidades'], 'ingresos': fila['ingresos']}
+                    for fila in filas
+                }
+
+        def clientes():
+            if "nombre" in campos and "total" in campos:
+                # $sort seguido de $limit: el servidor sólo mantiene los 10 mayores
+                filas = self._agregar("clientes", [
+                    {'$group': {'_id': '$nombre', 'gasto': {'$sum': '$total'}, 'compras': {'$sum': 1}}},
+                    {'$sort': {'gasto': -1, '_id': 1}},
+                    {'$limit': 10},
+                ])
+                resultado['clientes'] = [
+                    {'nombre': fila['_id'], 'gasto': fila['gasto'], 'compras': fila['compras']}
+                    for fila in filas
+                ]
+
+        funciones = {
+            "carga": carga,
+            "metricas": metricas,
+            "ventas_por_dia": ventas_por_dia,
+            "productos": productos,
+            "clientes": clientes,
+        }
+        return self._recorrer_secciones(resultado, funciones, lambda: 'tickets' in datos, parcial)
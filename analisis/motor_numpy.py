@@ -0,0 +1,273 @@
+import datetime
+import time
+from array import array
+from db.conexion import get_db
+from analisis.motores import MotorBase, TOTAL_PASOS, FUENTE_PARQUET
+
+# Documentos por lote del cursor; cada lote se pasa a arrays y se comprueba la cancelación
+TAMANO_LOTE = 20_000
+
+# Día o nombre ausente en un ticket
+SIN_VALOR = -1
+
+# Ordinal del 1970-01-01: las fechas de Parquet son milisegundos desde esa fecha
+ORDINAL_EPOCA = datetime.date(1970, 1, 1).toordinal()
+MILISEGUNDOS_DIA = 86_400_000
+
+
+class _Interrumpida(Exception):
+    """La sección en curso se canceló o superó su límite"""
+
+
+class _Codigos(dict):
+    """Asigna a cada valor distinto un entero consecutivo (la factorización de una columna)"""
+
+    def codigo(self, valor):
+        codigo = self.get(valor)
+        if codigo is None:
+            codigo = self[valor] = len(self)
+        return codigo
+
+    def valores(self):
+        return list(self)
+
+
+class MotorNumpy(MotorBase):
+    """Análisis en el propio proceso: los tickets del periodo se leen por lotes a arrays
+    columnares de NumPy y cada sección es una agrupación vectorizada sobre ellos"""
+
+    nombre = "numpy"
+
+    def _comprobar(self):
+        if self._interrupcion is not None:
+            raise _Interrumpida()
+
+    def _avisar_lectura(self, detalle, paso, mensaje, inicio, leidos, esperados):
+        transcurrido = time.monotonic() - inicio
+        detalle({
+            'paso': paso,
+            'total_pasos': TOTAL_PASOS,
+            'seccion': mensaje,
+            'unidad': "documentos",
+            'tareas_completadas': leidos,
+            'tareas_totales': esperados,
+            'transcurrido': transcurrido,
+            'eta': transcurrido * (esperados - leidos) / leidos if 0 < leidos < esperados else None,
+        })
+
+    def _leer_columnas(self, np, paso, mensaje, detalle):
+        """Lee los tickets del periodo a arrays: día (ordinal), total, nombre y líneas de productos"""
+        if self.fuente == FUENTE_PARQUET:
+            return self._leer_parquet(np, paso, mensaje, detalle)
+        campos = self._campos_lectura
+        coleccion = get_db()[self.coleccion]
+        filtro = self.filtro_lectura()
+        esperados = coleccion.count_documents(filtro) if filtro else coleccion.estimated_document_count()
+
+        nombres, productos = _Codigos(), _Codigos()
+        trozos = {c: [] for c in ("dia", "total", "nombre", "producto", "cantidad", "importe")}
+        inicio = time.monotonic()
+        leidos = 0
+
+        def volcar(lote):
+            for columna, valores in lote.items():
+                trozos[columna].append(np.array(valores, dtype=valores.typecode))
+
+        def nuevo_lote():
+            return {"dia": array("l"), "total": array("d"), "nombre": array("l"),
+                    "producto": array("l"), "cantidad": array("d"), "importe": array("d")}
+
+        lote = nuevo_lote()
+        with coleccion.find(filtro, self.proyeccion_lectura(), batch_size=TAMANO_LOTE) as cursor:
+            for ticket in cursor:
+                if "fecha" in campos:
+                    fecha = ticket.get("fecha")
+                    lote["dia"].append(fecha.toordinal() if isinstance(fecha, datetime.datetime) else SIN_VALOR)
+                if "total" in campos:
+                    total = ticket.get("total")
+                    lote["total"].append(float("nan") if total is None else total)
+                if "nombre" in campos:
+                    lote["nombre"].append(nombres.codigo(ticket.get("nombre")))
+                if "productos" in campos:
+                    for producto in ticket.get("productos") or ():
+                        cantidad = producto.get("cantidad") or 0
+                        lote["producto"].append(productos.codigo(producto.get("nombre")))
+                        lote["cantidad"].append(cantidad)
+                        lote["importe"].append((producto.get("precio") or 0) * cantidad)
+                leidos += 1
+                if leidos % TAMANO_LOTE == 0:
+                    volcar(lote)
+                    lote = nuevo_lote()
+                    self._comprobar()
+                    self._avisar_lectura(detalle, paso, mensaje, inicio, leidos, esperados)
+        volcar(lote)
+
+        columnas = {c: np.concatenate(t) for c, t in trozos.items()}
+        columnas['registros'] = leidos
+        columnas['nombres'] = nombres.valores()
+        columnas['productos'] = productos.valores()
+        return columnas
+
+    def _leer_parquet(self, np, paso, mensaje, detalle):
+        """Como _leer_columnas, pero desde la instantánea Parquet: cada lote ya es columnar y se
+        factoriza con dictionary_encode en lugar de documento a documento"""
+        import pyarrow as pa
+        from analisis.exportacion_parquet import TABLA_TICKETS, TABLA_LINEAS, abrir_tabla, filtro_parquet
+
+        campos = self._campos_lectura
+        nombres, productos = _Codigos(), _Codigos()
+        trozos = {c: [] for c in ("dia", "total", "nombre", "producto", "cantidad", "importe")}
+
+        def codigos(columna, valores):
+            # Códigos del lote (nulos incluidos) traducidos a los códigos globales de la columna
+            codificada = columna.dictionary_encode(null_encoding="encode")
+            globales = np.array([valores.codigo(v) for v in codificada.dictionary.to_pylist()], dtype=np.int64)
+            return globales[codificada.indices.to_numpy(zero_copy_only=False)]
+
+        tickets = abrir_tabla(TABLA_TICKETS)
+        filtro = filtro_parquet(self.inicio, self.fin, self.desde_id, self.hasta_id)
+        esperados = tickets.count_rows(filter=filtro)
+        columnas = [c for c in ("fecha", "total", "nombre") if c in campos] or ["_id"]
+        inicio = time.monotonic()
+        leidos = 0
+        for lote in tickets.to_batches(columns=columnas, filter=filtro, batch_size=TAMANO_LOTE):
+            if "fecha" in campos:
+                fecha = lote.column("fecha")
+                validos = fecha.is_valid().to_numpy(zero_copy_only=False)
+                milisegundos = fecha.cast(pa.int64()).fill_null(0).to_numpy()
+                trozos["dia"].append(np.where(validos, milisegundos // MILISEGUNDOS_DIA + ORDINAL_EPOCA, SIN_VALOR))
+            if "total" in campos:
+                trozos["total"].append(lote.column("total").fill_null(float("nan")).to_numpy())
+            if "nombre" in campos:
+                trozos["nombre"].append(codigos(lote.column("nombre"), nombres))
+            leidos += lote.num_rows
+            self._comprobar()
+            self._avisar_lectura(detalle, paso, mensaje, inicio, leidos, esperados)
+
+        if "productos" in campos:
+            lineas = abrir_tabla(TABLA_LINEAS)
+            filtro = filtro_parquet(self.inicio, self.fin, self.desde_id, self.hasta_id, campo_id="ticket_id")
+            for lote in lineas.to_batches(columns=["nombre", "cantidad", "importe"], filter=filtro,
+                                          batch_size=TAMANO_LOTE):
+                trozos["producto"].append(codigos(lote.column("nombre"), productos))
+                trozos["cantidad"].append(lote.column("cantidad").cast(pa.float64()).fill_null(0).to_numpy())
+                trozos["importe"].append(lote.column("importe").fill_null(0).to_numpy())
+                self._comprobar()
+
+        vacios = {"dia": np.int64, "total": np.float64, "nombre": np.int64,
+                  "producto": np.int64, "cantidad": np.float64, "importe": np.float64}
+        resultado = {c: np.concatenate(t) if t else np.array([], dtype=vacios[c]) for c, t in trozos.items()}
+        resultado['registros'] = leidos
+        resultado['nombres'] = nombres.valores()
+        resultado['productos'] = productos.valores()
+        return resultado
+
+    def analizar(self, progreso=None, parcial=None, detalle=None):
+        """Devuelve el resultado estructurado del análisis (ver analisis/reporte.py)
+
+        Mismos callbacks que MotorSpark; detalle(estado) informa de los documentos leídos
+        durante la carga, la única sección que no es instantánea.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise Exception(f"El motor NumPy necesita numpy instalado: {str(e)}")
+
+        self._progreso = progreso or (lambda paso, total, mensaje: None)
+        parcial = parcial or (lambda resultado: None)
+        detalle = detalle or (lambda estado: None)
+        self._secciones = []
+
+        self._progreso(1, TOTAL_PASOS, "Preparando el análisis en memoria...")
+        resultado = self._nuevo_resultado()
+        datos = {}
+        campos = self._campos_lectura
+
+        def carga():
+            try:
+                datos['tickets'] = self._leer_columnas(np, 2, "Cargando datos desde MongoDB...", detalle)
+            except _Interrumpida:
+                raise
+            except Exception as e:
+                raise Exception(f"Error al cargar datos: {str(e)}")
+
+        def metricas():
+            tickets = datos['tickets']
+            resultado['total_registros'] = tickets['registros']
+            if "fecha" in campos:
+                dias = tickets['dia'][tickets['dia'] != SIN_VALOR]
+                if dias.size:
+                    resultado['fecha_min'] = datetime.date.fromordinal(int(dias.min())).isoformat()
+                    resultado['fecha_max'] = datetime.date.fromordinal(int(dias.max())).isoformat()
+            if "total" in campos:
+                totales = tickets['total'][~np.isnan(tickets['total'])]
+                resultado['estadisticas'] = {
+                    'ventas': tickets['registros'],
+                    'con_total': int(totales.size),
+                    'ingresos': float(totales.sum()),
+                    'maxima': float(totales.max()) if totales.size else None,
+                    'minima': float(totales.min()) if totales.size else None,
+                }
+
+        def ventas_por_dia():
+            tickets = datos['tickets']
+            if "fecha" in campos and "total" in campos:
+                validos = tickets['dia'] != SIN_VALOR
+                dias, grupo = np.unique(tickets['dia'][validos], return_inverse=True)
+                totales = np.bincount(grupo, weights=np.nan_to_num(tickets['total'][validos]),
+                                      minlength=dias.size)
+                ventas = np.bincount(grupo, minlength=dias.size)
+                if "nombre" in campos:
+                    # Como count("nombre"): sólo los tickets con nombre
+                    sin_nombre = tickets['nombres'].index(None) if None in tickets['nombres'] else SIN_VALOR
+                    clientes = np.bincount(grupo, weights=tickets['nombre'][validos] != sin_nombre,
+                                           minlength=dias.size)
+                else:
+                    clientes = np.zeros(dias.size)
+                resultado['ventas_por_dia'] = {
+                    datetime.date.fromordinal(int(dia)).isoformat(): {
+                        'total': float(total),
+                        'ventas': int(venta),
+                        'clientes': int(cliente),
+                    }
+                    for dia, total, venta, cliente in zip(dias, totales, ventas, clientes)
+                }
+
+        def productos():
+            tickets = datos['tickets']
+            if "productos" in campos:
+                cantidad = len(tickets['productos'])
+                unidades = np.bincount(tickets['producto'], weights=tickets['cantidad'], minlength=cantidad)
+                ingresos = np.bincount(tickets['producto'], weights=tickets['importe'], minlength=cantidad)
+                resultado['productos'] = {
+                    nombre: {'unidades': int(unidades[i]), 'ingresos': float(ingresos[i])}
+                    for i, nombre in enumerate(tickets['productos'])
+                }
+
+        def clientes():
+            tickets = datos['tickets']
+            if "nombre" in campos and "total" in campos:
+                cantidad = len(tickets['nombres'])
+                gasto = np.bincount(tickets['nombre'], weights=np.nan_to_num(tickets['total']),
+                                    minlength=cantidad)
+                compras = np.bincount(tickets['nombre'], minlength=cantidad)
+                # Los 10 mayores sin ordenar todos los clientes
+                top = min(10, cantidad)
+                mayores = np.argpartition(-gasto, top - 1)[:top] if top else np.array([], dtype=int)
+                mayores = mayores[np.argsort(-gasto[mayores], kind="stable")]
+                resultado['clientes'] = [
+                    {'nombre': tickets['nombres'][i], 'gasto': float(gasto[i]), 'compras': int(compras[i])}
+                    for i in mayores
+                ]
+
+        funciones = {
+            "carga": carga,
+            "metricas": metricas,
+            "ventas_por_dia": ventas_por_dia,
+            "productos": productos,
+            "clientes": clientes,
+        }
+        try:
+            return self._recorrer_secciones(resultado, funciones, lambda: 'tickets' in datos, parcial)
+        finally:
+            datos.clear()
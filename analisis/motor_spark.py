@@ -0,0 +1,232 @@
+import datetime
+import uuid
+from bson import json_util
+from analisis.sesion_spark import get_gestor_spark, URI_CLIENTES
+from analisis.exportacion_parquet import TABLA_TICKETS, TABLA_LINEAS, comprobar_instantanea, ruta_tabla
+from analisis.progreso_spark import MonitorSpark
+from analisis.motores import MotorBase, TOTAL_PASOS, FUENTE_PARQUET, texto_fecha
+
+
+class MotorSpark(MotorBase):
+    """Análisis completo con Spark: una sola lectura de 'clientes', cacheada y reutilizada"""
+
+    nombre = "spark"
+
+    def __init__(self, **argumentos):
+        super().__init__(**argumentos)
+        self.spark = None
+        self._monitor = None
+        # Prefijo de los job groups de este análisis: cada sección usa el suyo
+        self._prefijo_grupo = f"analisis-{uuid.uuid4().hex[:8]}"
+
+    def _grupo(self, clave):
+        return f"{self._prefijo_grupo}-{clave}"
+
+    def _interrumpir(self, motivo):
+        seccion = self._seccion_en_curso
+        if not super()._interrumpir(motivo):
+            return False
+        sc = self.spark.sparkContext
+        sc.cancelJobGroup(self._grupo(seccion))
+        # Sin 'pinned threads' el job group puede no haber llegado a los jobs: se cancelan
+        # uno a uno los que el monitor atribuyó a la sección
+        for trabajo in self._monitor.trabajos_sin_grupo():
+            sc._jsc.sc().cancelJob(trabajo)
+        return True
+
+    def _esquema(self):
+        """Esquema fijo de los campos pedidos: evita el muestreo con que el conector lo infiere"""
+        from pyspark.sql.types import (ArrayType, DoubleType, LongType, StringType,
+                                       StructField, StructType, TimestampType)
+
+        tipos = {
+            "nombre": StringType(),
+            "total": DoubleType(),
+            "fecha": TimestampType(),
+            "productos": ArrayType(StructType([
+                StructField("nombre", StringType()),
+                StructField("precio", DoubleType()),
+                StructField("cantidad", LongType()),
+            ])),
+        }
+        return StructType([StructField(campo, tipos[campo]) for campo in self._campos_lectura])
+
+    def _cargar(self):
+        if self.fuente == FUENTE_PARQUET:
+            columnas = [c for c in self._campos_lectura if c != "productos"]
+            return self._leer_parquet(TABLA_TICKETS, "_id").select(*columnas)
+        # El conector espera el pipeline en Extended JSON; en modo canónico las fechas
+        # van como milisegundos, igual que las guarda pymongo
+        pipeline = json_util.dumps(self.pipeline_lectura(), json_options=json_util.CANONICAL_JSON_OPTIONS)
+        return self.spark.read \
+            .format("mongo") \
+            .option("uri", URI_CLIENTES) \
+            .option("collection", self.coleccion) \
+            .option("pipeline", pipeline) \
+            .schema(self._esquema()) \
+            .load()
+
+    def _leer_parquet(self, tabla, campo_id):
+        """Tabla de la instantánea Parquet filtrada por periodo y _id; el filtro sobre 'dia'
+        descarta particiones enteras"""
+        from pyspark.sql.functions import col, lit
+
+        comprobar_instantanea()
+        df = self.spark.read.parquet(ruta_tabla(tabla))
+        # Las fechas van como texto: se interpretan en la zona de la sesión (UTC), igual que 'fecha'
+        if self.inicio is not None:
+            df = df.filter(col("dia") >= lit(self.inicio.strftime("%Y-%m-%d")).cast("date")) \
+                .filter(col("fecha") >= lit(self.inicio.strftime("%Y-%m-%d %H:%M:%S")).cast("timestamp"))
+        if self.fin is not None:
+            ultimo_dia = self.fin - datetime.timedelta(microseconds=1)
+            df = df.filter(col("dia") <= lit(ultimo_dia.strftime("%Y-%m-%d")).cast("date")) \
+                .filter(col("fecha") < lit(self.fin.strftime("%Y-%m-%d %H:%M:%S")).cast("timestamp"))
+        if self.desde_id is not None:
+            df = df.filter(col(campo_id) > str(self.desde_id))
+        if self.hasta_id is not None:
+            df = df.filter(col(campo_id) <= str(self.hasta_id))
+        return df
+
+    def _comenzar_seccion(self, paso, clave, mensaje):
+        # Cada sección bajo su propio job group: así se cancelan sólo sus jobs
+        self.spark.sparkContext.setJobGroup(self._grupo(clave), mensaje, interruptOnCancel=True)
+        self._monitor.comenzar_seccion(paso, TOTAL_PASOS, mensaje, self._grupo(clave))
+
+    def _terminar_seccion(self, transcurrido):
+        return self._monitor.terminar_seccion()
+
+    def analizar(self, progreso=None, parcial=None, detalle=None):
+        """Devuelve el resultado estructurado del análisis (ver analisis/reporte.py)
+
+        progreso(paso, total, mensaje) se llama al empezar cada sección, parcial(resultado)
+        al terminarla con lo calculado hasta ese momento y detalle(estado) con el avance de
+        los jobs según el StatusTracker. Ninguno se llama desde el hilo de Tk: detalle llega
+        además desde el hilo del monitor.
+        """
+        from pyspark import StorageLevel
+        from pyspark.sql.functions import col, count, explode, max, min, sum, to_date
+
+        self._progreso = progreso or (lambda paso, total, mensaje: None)
+        parcial = parcial or (lambda resultado: None)
+        self._secciones = []
+
+        self._progreso(1, TOTAL_PASOS, "Conectando con Spark...")
+        try:
+            self.spark = get_gestor_spark().obtener()
+        except Exception as e:
+            raise Exception(f"Error al conectar con Spark: {str(e)}")
+
+        resultado = self._nuevo_resultado()
+        datos = {}
+
+        def carga():
+            try:
+                df = self._cargar()
+                columnas = set(df.columns)
+            except Exception as e:
+                if self._interrupcion is not None:
+                    raise
+                raise Exception(f"Error al cargar datos: {str(e)}")
+
+            proyeccion = [col(c) for c in ("nombre", "total", "productos") if c in columnas]
+            if "fecha" in columnas:
+                # 'fecha' es un datetime BSON con hora local guardada tal cual; la sesión usa UTC
+                proyeccion.append(to_date(col("fecha")).alias("dia"))
+            # Sólo las columnas necesarias, leídas una vez: el resto de acciones salen de la caché
+            datos['base'] = df.select(*proyeccion).persist(StorageLevel.MEMORY_AND_DISK)
+            if self.fuente == FUENTE_PARQUET and "productos" in self._campos_lectura:
+                # Las líneas ya están aplanadas en su propia tabla: sólo las lee la sección de productos
+                datos['lineas'] = self._leer_parquet(TABLA_LINEAS, "ticket_id") \
+                    .select("nombre", "cantidad", "importe")
+
+        def metricas():
+            base = datos['base']
+            agregados = [count("*").alias("registros")]
+            if "dia" in base.columns:
+                agregados += [min("dia").alias("fecha_min"), max("dia").alias("fecha_max")]
+            if "total" in base.columns:
+                agregados += [count("total").alias("con_total"), sum("total").alias("ingresos"),
+                              max("total").alias("maxima"), min("total").alias("minima")]
+            # Esta primera acción es la que lee MongoDB y llena la caché
+            escalares = base.agg(*agregados).first()
+            resultado['total_registros'] = escalares['registros']
+            if "dia" in base.columns:
+                resultado['fecha_min'] = texto_fecha(escalares['fecha_min'])
+                resultado['fecha_max'] = texto_fecha(escalares['fecha_max'])
+            if "total" in base.columns:
+                resultado['estadisticas'] = {
+                    'ventas': escalares['registros'],
+                    'con_total': escalares['con_total'],
+                    'ingresos': escalares['ingresos'] or 0,
+                    'maxima': escalares['maxima'],
+                    'minima': escalares['minima'],
+                }
+
+        def ventas_por_dia():
+            base = datos['base']
+            if "dia" in base.columns and "total" in base.columns:
+                filas = base.groupBy("dia").agg(
+                    sum("total").alias("total"),
+                    count("*").alias("ventas"),
+                    count("nombre").alias("clientes")
+                ).collect()
+                resultado['ventas_por_dia'] = {
+                    texto_fecha(fila['dia']): {
+                        'total': fila['total'] or 0,
+                        'ventas': fila['ventas'],
+                        'clientes': fila['clientes'],
+                    }
+                    for fila in filas if fila['dia'] is not None
+                }
+
+        def productos():
+            base = datos['base']
+            if 'lineas' in datos:
+                lineas = datos['lineas']
+            elif "productos" in base.columns:
+                lineas = base.select(explode("productos").alias("producto")).select(
+                    col("producto.nombre").alias("nombre"),
+                    col("producto.cantidad").alias("cantidad"),
+                    (col("producto.precio") * col("producto.cantidad")).alias("importe"))
+            else:
+                return
+            # Una fila por producto del catálogo: se recogen todas para poder combinarlas después
+            filas = lineas.groupBy("nombre") \
+                .agg(sum("cantidad").alias("unidades"), sum("importe").alias("ingresos")) \
+                .collect()
+            resultado['productos'] = {
+                fila['nombre']: {'unidades': fila['unidades'], 'ingresos': fila['ingresos']}
+                for fila in filas
+            }
+
+        def clientes():
+            base = datos['base']
+            if "nombre" in base.columns and "total" in base.columns:
+                filas = base.groupBy("nombre") \
+                    .agg(sum("total").alias("gasto"), count("*").alias("compras")) \
+                    .orderBy(col("gasto").desc()) \
+                    .limit(10) \
+                    .collect()
+                resultado['clientes'] = [
+                    {'nombre': fila['nombre'], 'gasto': fila['gasto'], 'compras': fila['compras']}
+                    for fila in filas
+                ]
+
+        funciones = {
+            "carga": carga,
+            "metricas": metricas,
+            "ventas_por_dia": ventas_por_dia,
+            "productos": productos,
+            "clientes": clientes,
+        }
+
+        self._monitor = MonitorSpark(self.spark, detalle or (lambda estado: None))
+        self._monitor.iniciar()
+        try:
+            return self._recorrer_secciones(resultado, funciones, lambda: 'base' in datos, parcial)
+        finally:
+            self._monitor.detener()
+            self.spark.sparkContext.setLocalProperty("spark.jobGroup.id", None)
+            if 'base' in datos:
+                datos['base'].unpersist()
+
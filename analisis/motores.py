@@ -0,0 +1,328 @@
+import datetime
+import importlib.util
+import threading
+import time
+from db.conexion import get_db
+from db.ventas import filtro_fecha
+from db.ventas_diarias import COLECCION as COLECCION_ROLLUP, rollup_vigente, productos_de_rollup
+
+# Campos de 'clientes' que sabe usar el análisis; sólo se leen de MongoDB los pedidos
+CAMPOS = ("nombre", "total", "fecha", "productos")
+
+# Segundos que puede durar cada sección antes de interrumpirla y seguir con la siguiente;
+# None la deja sin límite
+PRESUPUESTOS_SECCION = {
+    "carga": 120,
+    "metricas": 600,
+    "ventas_por_dia": 300,
+    "productos": 300,
+    "clientes": 300,
+}
+
+# (paso, clave, mensaje) de cada sección, en el orden en que se ejecutan
+SECCIONES = [
+    (2, "carga", "Cargando datos desde MongoDB..."),
+    (3, "metricas", "Calculando métricas generales..."),
+    (4, "ventas_por_dia", "Analizando ventas por día..."),
+    (5, "productos", "Analizando productos..."),
+    (6, "clientes", "Analizando clientes..."),
+]
+TOTAL_PASOS = 6
+
+# Estados con que termina una sección
+COMPLETA = "completa"
+EXCEDIDA = "excedida"
+CANCELADA = "cancelada"
+OMITIDA = "omitida"
+ERROR = "error"
+
+# Motores que se pueden pedir a crear_motor(); 'auto' elige entre numpy y spark
+MOTORES = ("auto", "numpy", "spark", "mongo")
+
+# De dónde leen los tickets los motores: la colección 'clientes' o la instantánea Parquet
+# que genera analisis/exportacion_parquet.py
+FUENTE_MONGO = "mongo"
+FUENTE_PARQUET = "parquet"
+FUENTES = (FUENTE_MONGO, FUENTE_PARQUET)
+
+# Tickets a partir de los que se elige Spark. MotorNumpy decodifica cada documento de
+# MongoDB en un bucle de Python (del orden de 10^5 tickets/s), así que hacia el medio
+# millón ya tarda lo que arrancar la JVM y a partir de ahí Spark reparte mejor el trabajo.
+# Valor conservador: ajustarlo con las cifras de python -m scripts.benchmark_motores
+UMBRAL_SPARK = 500_000
+
+
+class MotorBase:
+    """Lo común a los motores de análisis: periodo, campos, límites, rollup y secciones"""
+
+    nombre = None
+    # Si el límite de cada sección lo vigila un temporizador local; MotorMongo lo delega
+    # en el servidor (maxTimeMS)
+    temporizador_seccion = True
+
+    def __init__(self, inicio=None, fin=None, campos=CAMPOS, presupuestos=None, usar_rollup=True,
+                 desde_id=None, hasta_id=None, coleccion="clientes", fuente=FUENTE_MONGO):
+        if fuente not in FUENTES:
+            raise ValueError(f"Fuente de datos desconocida: {fuente}")
+        # Colección de tickets: otra distinta de 'clientes' sólo para pruebas de rendimiento
+        self.coleccion = coleccion
+        self.fuente = fuente
+        # Periodo [inicio, fin) con datetimes locales sin zona, igual que 'fecha'; None = abierto
+        self.inicio = inicio
+        self.fin = fin
+        # Tickets con _id en (desde_id, hasta_id]: los fija la caché de resultados para que
+        # lo analizado coincida con su marca de agua
+        self.desde_id = desde_id
+        self.hasta_id = hasta_id
+        self.campos = [c for c in CAMPOS if c in campos]
+        # Campos que se leen de 'clientes': sin 'productos' si el rollup ya da esa sección
+        self._campos_lectura = list(self.campos)
+        # El rollup cubre días completos de 'clientes': no sirve para sólo los tickets
+        # posteriores a un _id, para otra colección ni para la instantánea (que va por detrás)
+        self.usar_rollup = (usar_rollup and desde_id is None and coleccion == "clientes"
+                            and fuente == FUENTE_MONGO)
+        self.presupuestos = dict(PRESUPUESTOS_SECCION, **(presupuestos or {}))
+        self._secciones = []
+        self._progreso = lambda paso, total, mensaje: None
+        self._lock = threading.Lock()
+        self._seccion_en_curso = None
+        self._interrupcion = None
+        self._cancelado = False
+
+    def cancelar(self):
+        """Interrumpe la sección en curso y omite las que faltan (seguro desde cualquier hilo)"""
+        with self._lock:
+            self._cancelado = True
+        self._interrumpir(CANCELADA)
+
+    def _interrumpir(self, motivo):
+        """Marca la sección en curso como interrumpida; el motor lo comprueba mientras trabaja"""
+        with self._lock:
+            if self._seccion_en_curso is None or self._interrupcion is not None:
+                return False
+            self._interrupcion = motivo
+            return True
+
+    def filtro_lectura(self):
+        """Filtro de 'clientes': periodo y, si se indicó, rango de _id (usa el índice (fecha, _id))"""
+        filtro = filtro_fecha(self.inicio, self.fin)
+        rango_id = {}
+        if self.desde_id is not None:
+            rango_id['$gt'] = self.desde_id
+        if self.hasta_id is not None:
+            rango_id['$lte'] = self.hasta_id
+        if rango_id:
+            filtro['_id'] = rango_id
+        return filtro
+
+    def proyeccion_lectura(self):
+        proyeccion = {campo: 1 for campo in self._campos_lectura}
+        proyeccion['_id'] = 0
+        return proyeccion
+
+    def pipeline_lectura(self):
+        """Etapas que ejecuta MongoDB antes de enviar nada al motor: filtro y proyección"""
+        pipeline = []
+        filtro = self.filtro_lectura()
+        if filtro:
+            pipeline.append({'$match': filtro})
+        pipeline.append({'$project': self.proyeccion_lectura()})
+        return pipeline
+
+    def _nuevo_resultado(self):
+        return {
+            'fecha_analisis': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'motor': self.nombre,
+            'fuente': self.fuente,
+            'total_registros': 0,
+            'fecha_min': None,
+            'fecha_max': None,
+            'ventas_por_dia': None,
+            'productos': None,
+            'clientes': None,
+            'estadisticas': None,
+            'secciones': self._secciones,
+            'cancelado': False,
+            'periodo': {
+                'desde': self.inicio.strftime('%Y-%m-%d') if self.inicio else None,
+                'hasta': (self.fin - datetime.timedelta(days=1)).strftime('%Y-%m-%d') if self.fin else None,
+            },
+        }
+
+    def _leer_rollup(self, resultado):
+        """Rellena las secciones por día y de productos con 'ventas_diarias' si cuadra con los
+        tickets del periodo; devuelve las claves de las secciones que ya no hace falta calcular"""
+        if not self.usar_rollup:
+            return set()
+        try:
+            db = get_db()
+            documentos = rollup_vigente(db, self.inicio, self.fin)
+            if documentos is not None and self.hasta_id is not None:
+                # Con tope de _id el rollup sólo vale si no llegaron tickets después de ese _id
+                filtro = filtro_fecha(self.inicio, self.fin)
+                filtro['_id'] = {'$lte': self.hasta_id}
+                if db["clientes"].count_documents(filtro) != sum(doc['clientes'] for doc in documentos):
+                    documentos = None
+        except Exception as e:
+            print("No se pudo leer ventas_diarias:", e)
+            return set()
+        if documentos is None:
+            return set()
+
+        servidas = set()
+        if "fecha" in self.campos and "total" in self.campos:
+            resultado['ventas_por_dia'] = {
+                doc['_id'].strftime('%Y-%m-%d'): {
+                    'total': doc['total'],
+                    'ventas': doc['clientes'],
+                    'clientes': doc['clientes'],
+                }
+                for doc in documentos
+            }
+            servidas.add("ventas_por_dia")
+        if "productos" in self.campos:
+            resultado['productos'] = productos_de_rollup(documentos)
+            servidas.add("productos")
+        if "productos" in servidas:
+            self._campos_lectura = [c for c in self.campos if c != "productos"]
+        return servidas
+
+    def _estado_tras_error(self, clave, error):
+        """Estado de una sección que lanzó una excepción: el de la interrupción si la hubo; si no,
+        queda con error y el análisis sigue con las demás (salvo la carga: sin datos no hay nada)"""
+        if self._interrupcion is not None:
+            return self._interrupcion
+        if clave == "carga":
+            raise error
+        return ERROR
+
+    def _registrar_seccion(self, clave, mensaje, estado, avance, origen=None, error=None):
+        self._secciones.append({
+            'clave': clave,
+            'seccion': mensaje,
+            'estado': estado,
+            'origen': origen or self.nombre,
+            'presupuesto': self.presupuestos.get(clave),
+            'segundos': avance['transcurrido'] if avance else 0,
+            'tareas': avance['tareas_totales'] if avance else 0,
+            'bytes_leidos': avance.get('bytes_leidos') if avance else None,
+            'error': error,
+        })
+
+    def _comenzar_seccion(self, paso, clave, mensaje):
+        """Lo que necesita cada motor antes de calcular una sección"""
+
+    def _terminar_seccion(self, transcurrido):
+        """Avance de la sección que termina ({'transcurrido', 'tareas_totales', ...})"""
+        return {'transcurrido': transcurrido, 'tareas_totales': 0}
+
+    def _ejecutar_seccion(self, paso, clave, mensaje, funcion):
+        """Ejecuta una sección con su límite de tiempo; devuelve el estado con que terminó.
+
+        Si se interrumpe (por el límite o por cancelar()) el error que provoque se descarta
+        y la sección queda como parcial; cualquier otro error se anota en la sección y el
+        análisis sigue con las demás.
+        """
+        self._progreso(paso, TOTAL_PASOS, mensaje)
+        with self._lock:
+            cancelado = self._cancelado
+            if not cancelado:
+                self._seccion_en_curso = clave
+                self._interrupcion = None
+        if cancelado:
+            self._registrar_seccion(clave, mensaje, CANCELADA, None)
+            return CANCELADA
+
+        self._comenzar_seccion(paso, clave, mensaje)
+        limite = None
+        if self.temporizador_seccion and self.presupuestos.get(clave):
+            limite = threading.Timer(self.presupuestos[clave], self._interrumpir, args=(EXCEDIDA,))
+            limite.daemon = True
+            limite.start()
+        inicio = time.monotonic()
+        error = None
+        try:
+            funcion()
+            estado = COMPLETA
+        except Exception as e:
+            estado = self._estado_tras_error(clave, e)
+            if estado == ERROR:
+                error = str(e)
+        finally:
+            if limite is not None:
+                limite.cancel()
+            with self._lock:
+                self._seccion_en_curso = None
+            avance = self._terminar_seccion(time.monotonic() - inicio)
+        self._registrar_seccion(clave, mensaje, estado, avance, error=error)
+        return estado
+
+    def _recorrer_secciones(self, resultado, funciones, cargado, parcial):
+        """Ejecuta las secciones en orden; las que dio el rollup o sin datos no se calculan"""
+        servidas = self._leer_rollup(resultado)
+        for paso, clave, mensaje in SECCIONES:
+            if clave in servidas:
+                # Calculada ya con el rollup diario: no hace falta leer ni agrupar tickets
+                self._progreso(paso, TOTAL_PASOS, mensaje)
+                self._registrar_seccion(clave, mensaje, COMPLETA, None, origen=COLECCION_ROLLUP)
+                parcial(dict(resultado))
+                continue
+            if clave != "carga" and not cargado():
+                # Sin datos cargados no hay nada que calcular
+                self._progreso(paso, TOTAL_PASOS, mensaje)
+                self._registrar_seccion(clave, mensaje, OMITIDA, None)
+                continue
+            self._ejecutar_seccion(paso, clave, mensaje, funciones[clave])
+            if clave != "carga":
+                parcial(dict(resultado))
+        resultado['cancelado'] = self._cancelado
+        return resultado
+
+
+def texto_fecha(fecha):
+    return fecha.isoformat() if fecha is not None else None
+
+
+def disponible(modulo):
+    return importlib.util.find_spec(modulo) is not None
+
+
+def elegir_motor(inicio=None, fin=None, desde_id=None, fuente=FUENTE_MONGO):
+    """'numpy' para periodos de hasta UMBRAL_SPARK tickets (o si no hay Spark), si no 'spark';
+    sin ninguno de los dos instalados, 'mongo' (que sólo necesita pymongo)"""
+    if not disponible("numpy"):
+        if disponible("pyspark"):
+            return "spark"
+        if fuente == FUENTE_PARQUET:
+            raise Exception("Analizar la instantánea Parquet necesita numpy o pyspark instalado")
+        return "mongo"
+    if not disponible("pyspark"):
+        return "numpy"
+    if fuente == FUENTE_PARQUET:
+        from analisis.exportacion_parquet import contar_tickets
+        tickets = contar_tickets(inicio, fin, desde_id)
+        return "numpy" if tickets <= UMBRAL_SPARK else "spark"
+    filtro = filtro_fecha(inicio, fin)
+    if desde_id is not None:
+        # Análisis incremental: cuenta sólo los tickets nuevos
+        filtro['_id'] = {'$gt': desde_id}
+    clientes = get_db()["clientes"]
+    tickets = clientes.count_documents(filtro) if filtro else clientes.estimated_document_count()
+    return "numpy" if tickets <= UMBRAL_SPARK else "spark"
+
+
+def crear_motor(nombre="auto", **argumentos):
+    """Instancia el motor indicado; 'auto' lo elige por el tamaño del periodo"""
+    if nombre == "auto":
+        nombre = elegir_motor(argumentos.get('inicio'), argumentos.get('fin'), argumentos.get('desde_id'),
+                              argumentos.get('fuente', FUENTE_MONGO))
+    if nombre == "numpy":
+        from analisis.motor_numpy import MotorNumpy
+        return MotorNumpy(**argumentos)
+    if nombre == "spark":
+        from analisis.motor_spark import MotorSpark
+        return MotorSpark(**argumentos)
+    if nombre == "mongo":
+        from analisis.motor_mongo import MotorMongo
+        return MotorMongo(**argumentos)
+    raise ValueError(f"Motor de análisis desconocido: {nombre}")
@@ -0,0 +1,132 @@
+import json
+import threading
+import time
+import urllib.request
+
+
+class MonitorSpark:
+    """Sigue, desde un hilo propio, los jobs de la sección en curso a través del StatusTracker"""
+
+    def __init__(self, spark, notificar, intervalo=0.5):
+        self.sc = spark.sparkContext
+        self.tracker = self.sc.statusTracker()
+        self.notificar = notificar
+        self.intervalo = intervalo
+        self._seccion = None
+        self._detener = threading.Event()
+        self._hilo = None
+        self._api_disponible = True
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="MonitorSpark", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(timeout=self.intervalo * 4)
+
+    def comenzar_seccion(self, paso, total_pasos, nombre, grupo):
+        """Marca la sección activa; sus jobs se reconocen por el job group"""
+        self._seccion = {
+            'paso': paso,
+            'total_pasos': total_pasos,
+            'nombre': nombre,
+            'grupo': grupo,
+            'inicio': time.monotonic(),
+            'trabajos_previos': set(self.tracker.getActiveJobsIds()),
+        }
+
+    def terminar_seccion(self):
+        """Devuelve el último estado de la sección activa y la da por cerrada"""
+        seccion, self._seccion = self._seccion, None
+        if seccion is None:
+            return None
+        estado = self.estado(seccion)
+        estado['eta'] = 0
+        self.notificar(estado)
+        return estado
+
+    def trabajos_sin_grupo(self):
+        """Jobs de la sección activa detectados por aparición, cuando no llevan su job group"""
+        seccion = self._seccion
+        if seccion is None:
+            return []
+        return sorted(seccion.get('trabajos_detectados', ()))
+
+    def estado(self, seccion):
+        """Trabajos, etapas, tareas y bytes leídos por los jobs de una sección"""
+        trabajos = list(self.tracker.getJobIdsForGroup(seccion['grupo']))
+        if not trabajos:
+            # Antes de Spark 3.2 (sin 'pinned threads') el job group puede no llegar al hilo
+            # de la JVM que lanza el job: se toman los jobs activos que no existían al empezar
+            nuevos = [j for j in self.tracker.getActiveJobsIds() if j not in seccion['trabajos_previos']]
+            seccion.setdefault('trabajos_detectados', set()).update(nuevos)
+            trabajos = sorted(seccion['trabajos_detectados'])
+
+        trabajos_activos = 0
+        etapas = set()
+        for trabajo in trabajos:
+            info = self.tracker.getJobInfo(trabajo)
+            if info is None:
+                continue
+            if info.status == "RUNNING":
+                trabajos_activos += 1
+            etapas.update(info.stageIds)
+
+        etapas_activas = 0
+        tareas_totales = 0
+        tareas_completadas = 0
+        for etapa in etapas:
+            info = self.tracker.getStageInfo(etapa)
+            if info is None:
+                continue
+            if info.numActiveTasks > 0:
+                etapas_activas += 1
+            tareas_totales += info.numTasks
+            tareas_completadas += info.numCompletedTasks
+
+        transcurrido = time.monotonic() - seccion['inicio']
+        eta = None
+        if 0 < tareas_completadas < tareas_totales:
+            eta = transcurrido * (tareas_totales - tareas_completadas) / tareas_completadas
+
+        return {
+            'paso': seccion['paso'],
+            'total_pasos': seccion['total_pasos'],
+            'seccion': seccion['nombre'],
+            'trabajos': len(trabajos),
+            'trabajos_activos': trabajos_activos,
+            'etapas_activas': etapas_activas,
+            'tareas_completadas': tareas_completadas,
+            'tareas_totales': tareas_totales,
+            'bytes_leidos': self._bytes_leidos(etapas),
+            'transcurrido': transcurrido,
+            'eta': eta,
+        }
+
+    def _bytes_leidos(self, etapas):
+        """Suma 'inputBytes' de las etapas según la API REST de la UI; None si no está disponible"""
+        url_ui = self.sc.uiWebUrl
+        if not etapas or not url_ui or not self._api_disponible:
+            return None
+        url = f"{url_ui}/api/v1/applications/{self.sc.applicationId}/stages"
+        try:
+            with urllib.request.urlopen(url, timeout=2) as respuesta:
+                datos = json.load(respuesta)
+        except Exception:
+            # UI desactivada o inaccesible: no se vuelve a intentar en este análisis
+            self._api_disponible = False
+            return None
+        return sum(etapa.get('inputBytes', 0) for etapa in datos if etapa.get('stageId') in etapas)
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            seccion = self._seccion
+            if seccion is None:
+                continue
+            try:
+                self.notificar(self.estado(seccion))
+            except Exception as e:
+                # El monitor nunca debe tumbar el análisis
+                print("No se pudo leer el progreso de Spark:", e)
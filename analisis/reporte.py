@@ -0,0 +1,153 @@
+# Nombre con que se muestra cada origen de los tickets
+_FUENTES = {"mongo": "MongoDB", "parquet": "la instantánea Parquet"}
+
+
+def formatear_duracion(segundos):
+    minutos, segundos = divmod(int(round(segundos)), 60)
+    return f"{minutos:02d}:{segundos:02d}"
+
+
+def formatear_bytes(cantidad):
+    for unidad in ("B", "KB", "MB", "GB"):
+        if cantidad < 1024 or unidad == "GB":
+            return f"{cantidad:.0f} {unidad}" if unidad == "B" else f"{cantidad:.1f} {unidad}"
+        cantidad /= 1024
+
+
+def formatear_avance(estado):
+    """Una línea con el avance de la sección en curso (tareas de Spark o documentos leídos)"""
+    partes = [estado['seccion'].rstrip('.')]
+    if estado['tareas_totales']:
+        partes.append(f"{estado.get('unidad', 'tareas')} {estado['tareas_completadas']}/{estado['tareas_totales']}")
+        if 'etapas_activas' in estado:
+            partes.append(f"etapas activas {estado['etapas_activas']}")
+    if estado.get('bytes_leidos') is not None:
+        partes.append(f"{formatear_bytes(estado['bytes_leidos'])} leídos")
+    partes.append(f"{formatear_duracion(estado['transcurrido'])} transcurrido")
+    if estado.get('eta') is not None:
+        partes.append(f"ETA {formatear_duracion(estado['eta'])}")
+    return " · ".join(partes)
+
+
+def _motivo_incompleta(seccion):
+    if seccion['estado'] == 'excedida':
+        return f"omitida al superar su límite de {formatear_duracion(seccion['presupuesto'])}"
+    if seccion['estado'] == 'cancelada':
+        return "cancelada por el usuario"
+    if seccion['estado'] == 'error':
+        return f"ERROR: {seccion.get('error')}"
+    return "omitida por falta de datos"
+
+
+def _error_de(resultado, clave):
+    """Mensaje de error de una sección, o None si no falló"""
+    for seccion in resultado.get('secciones') or []:
+        if seccion.get('clave') == clave and seccion.get('estado') == 'error':
+            return seccion.get('error')
+    return None
+
+
+def dia_con_mas_ventas(resultado):
+    """(fecha, datos) del día con mayor monto vendido, o None si no hay días"""
+    ventas_por_dia = resultado.get('ventas_por_dia') or {}
+    if not ventas_por_dia:
+        return None
+    return max(ventas_por_dia.items(), key=lambda item: item[1]['total'])
+
+
+def top_productos(resultado, limite=10):
+    productos = resultado.get('productos') or {}
+    return sorted(productos.items(), key=lambda item: (-item[1]['unidades'], item[0]))[:limite]
+
+
+def formatear_reporte(resultado):
+    """Texto del análisis completo a partir del resultado estructurado de un motor"""
+    lineas = [
+        "=== ANÁLISIS COMPLETO DEL SUPERMERCADO ===\n",
+        f"Fecha del análisis: {resultado['fecha_analisis']}",
+        f"Motor: {resultado.get('motor') or 'spark'} (datos de {_FUENTES.get(resultado.get('fuente'), 'MongoDB')})",
+        f"Total de registros: {resultado['total_registros']}\n",
+    ]
+
+    cache = resultado.get('cache')
+    if cache and cache['tipo'] == "completo":
+        lineas.append(f"Sin ventas nuevas: resultado guardado del {cache['calculado']}\n")
+    elif cache and cache['tipo'] == "anterior":
+        lineas.append(f"⚠️ Resultado guardado del {cache['calculado']}: el análisis de los tickets nuevos no terminó\n")
+    elif cache:
+        lineas.append(f"Actualizado con {cache['nuevos']} tickets nuevos sobre el resultado guardado\n")
+
+    periodo = resultado.get('periodo') or {}
+    if periodo.get('desde') or periodo.get('hasta'):
+        lineas.append(f"Periodo analizado: {periodo.get('desde') or 'inicio'} a {periodo.get('hasta') or 'hoy'}\n")
+
+    incompletas = [s for s in resultado.get('secciones') or [] if s.get('estado', 'completa') != 'completa']
+    if resultado.get('cancelado') or incompletas:
+        if resultado.get('cancelado'):
+            lineas.append("⚠️ ANÁLISIS CANCELADO (resultados parciales):")
+        else:
+            lineas.append("⚠️ ANÁLISIS PARCIAL:")
+        for seccion in incompletas:
+            lineas.append(f"   - {seccion['seccion'].rstrip('.')}: {_motivo_incompleta(seccion)}")
+        lineas.append("")
+
+    if resultado.get('fecha_min') is not None:
+        lineas.append(f"Rango de fechas en los datos:\n   - Desde: {resultado['fecha_min']}\n   - Hasta: {resultado['fecha_max']}\n")
+
+    mejor_dia = dia_con_mas_ventas(resultado)
+    if mejor_dia:
+        fecha, datos = mejor_dia
+        lineas.append(f"1. DÍA CON MÁS VENTAS (POR MONTO):\n   - Fecha: {fecha}\n   - Total vendido: ${datos['total']:.2f}\n   - Ventas realizadas: {datos['ventas']}\n")
+
+        clientes_por_dia = [datos['clientes'] for datos in resultado['ventas_por_dia'].values()]
+        promedio_clientes = sum(clientes_por_dia) / len(clientes_por_dia)
+        lineas.append(f"2. PROMEDIO DE CLIENTES POR DÍA:\n   - {promedio_clientes:.2f} clientes/día\n")
+
+    estadisticas = resultado.get('estadisticas')
+    if estadisticas and estadisticas['con_total']:
+        promedio_venta = estadisticas['ingresos'] / estadisticas['con_total']
+        lineas.append(f"3. PROMEDIO DE VENTA POR CLIENTE:\n   - ${promedio_venta:.2f} por cliente\n")
+
+    if resultado.get('productos') is not None:
+        lineas.append("4. PRODUCTOS MÁS VENDIDOS (TOP 10):")
+        for i, (nombre, datos) in enumerate(top_productos(resultado), 1):
+            lineas.append(f"   {i}. {nombre}: {int(datos['unidades'])} unidades (${datos['ingresos']:.2f})")
+        lineas.append("")
+
+    elif _error_de(resultado, "productos"):
+        lineas.append(f"4. ERROR en análisis de productos: {_error_de(resultado, 'productos')}\n")
+
+    if resultado.get('clientes') is not None:
+        lineas.append("5. CLIENTES QUE MÁS GASTARON (TOP 10):")
+        for i, cliente in enumerate(resultado['clientes'][:10], 1):
+            lineas.append(f"   {i}. {cliente['nombre']}: ${cliente['gasto']:.2f} ({cliente['compras']} compras)")
+        lineas.append("")
+    elif _error_de(resultado, "clientes"):
+        lineas.append(f"5. ERROR en análisis de clientes: {_error_de(resultado, 'clientes')}\n")
+
+    if estadisticas and estadisticas['con_total']:
+        lineas.append("6. ESTADÍSTICAS GENERALES:")
+        lineas.append(f"   - Total de ventas: {estadisticas['ventas']}")
+        lineas.append(f"   - Ingresos totales: ${estadisticas['ingresos']:.2f}")
+        lineas.append(f"   - Ticket promedio: ${estadisticas['ingresos'] / estadisticas['con_total']:.2f}")
+        lineas.append(f"   - Venta máxima: ${estadisticas['maxima']:.2f}")
+        lineas.append(f"   - Venta mínima: ${estadisticas['minima']:.2f}")
+
+    if resultado.get('secciones'):
+        lineas.append("")
+        lineas.append("7. TIEMPO POR SECCIÓN:")
+        motor = resultado.get('motor') or 'spark'
+        for seccion in resultado['secciones']:
+            detalle = f"   - {seccion['seccion'].rstrip('.')}: {formatear_duracion(seccion['segundos'])}"
+            if seccion.get('estado', 'completa') != 'completa':
+                detalle += f" [{seccion['estado']}]"
+            if seccion.get('origen', motor) != motor:
+                detalle += f" [desde {seccion['origen']}]"
+            if seccion['tareas']:
+                detalle += f" ({seccion['tareas']} tareas"
+                if seccion.get('bytes_leidos') is not None:
+                    detalle += f", {formatear_bytes(seccion['bytes_leidos'])} leídos"
+                detalle += ")"
+            lineas.append(detalle)
+
+    return "\n".join(lineas) + "\n"
@@ -0,0 +1,109 @@
+import atexit
+import glob
+import os
+import threading
+
+URI_CLIENTES = "mongodb://localhost:27017/supermercado_db.clientes"
+PAQUETE_CONECTOR = "org.mongodb.spark:mongo-spark-connector_2.12:3.0.1"
+
+# Jars del conector y sus dependencias, con los nombres que usan tanto Maven como la caché de Ivy
+# (en ~/.ivy2/jars aparecen con el grupo delante: org.mongodb_bson-4.0.5.jar)
+PATRONES_JARS = [
+    "*mongo-spark-connector_2.12-3.0.1.jar",
+    "*mongodb-driver-sync-4.0.5.jar",
+    "*mongodb-driver-core-4.0.5.jar",
+    "*bson-4.0.5.jar",
+]
+
+# Directorios donde buscar los jars, en orden: variable de entorno, ./jars del proyecto y caché de Ivy
+DIRECTORIOS_JARS = [
+    os.environ.get("SUPERMERCADO_SPARK_JARS", ""),
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "jars"),
+    os.path.join(os.path.expanduser("~"), ".ivy2", "jars"),
+]
+
+
+def jars_locales():
+    """Rutas de los jars del conector si están todos en disco, o None si falta alguno"""
+    for directorio in filter(None, DIRECTORIOS_JARS):
+        encontrados = []
+        for patron in PATRONES_JARS:
+            coincidencias = sorted(glob.glob(os.path.join(directorio, patron)))
+            if not coincidencias:
+                break
+            encontrados.append(coincidencias[0])
+        else:
+            return encontrados
+    return None
+
+
+class GestorSesionSpark:
+    """Mantiene una única SparkSession viva durante toda la aplicación"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sesion = None
+        self._hilo_precalentado = None
+
+    def _crear(self):
+        from pyspark.sql import SparkSession
+
+        builder = SparkSession.builder \
+            .appName("AnalisisSupermercado") \
+            .config("spark.mongodb.input.uri", URI_CLIENTES) \
+            .config("spark.mongodb.output.uri", URI_CLIENTES) \
+            .config("spark.sql.session.timeZone", "UTC")
+
+        jars = jars_locales()
+        if jars:
+            # Sin resolución de dependencias: no hace falta red ni Ivy
+            builder = builder.config("spark.jars", ",".join(jars))
+        else:
+            print("⚠️ Jars del conector de MongoDB no encontrados en local; se resolverán con Ivy (requiere red)")
+            builder = builder.config("spark.jars.packages", PAQUETE_CONECTOR)
+
+        return builder.getOrCreate()
+
+    def obtener(self):
+        """Devuelve la sesión compartida; si se está precalentando espera a que termine"""
+        with self._lock:
+            if self._sesion is None:
+                self._sesion = self._crear()
+            return self._sesion
+
+    def precalentar(self):
+        """Arranca la JVM y la sesión en segundo plano para que el primer análisis no espere"""
+        if self._sesion is not None or self._hilo_precalentado is not None:
+            return
+        self._hilo_precalentado = threading.Thread(target=self._precalentar, name="PrecalentarSpark", daemon=True)
+        self._hilo_precalentado.start()
+
+    def _precalentar(self):
+        try:
+            # Un job trivial carga las clases del planificador y levanta los ejecutores
+            self.obtener().range(1).count()
+        except Exception as e:
+            print("No se pudo precalentar Spark:", e)
+        finally:
+            self._hilo_precalentado = None
+
+    def detener(self):
+        with self._lock:
+            if self._sesion is not None:
+                self._sesion.stop()
+                self._sesion = None
+
+
+_gestor = None
+_gestor_lock = threading.Lock()
+
+
+def get_gestor_spark():
+    """Gestor de sesión compartido; la sesión se detiene al salir de la aplicación"""
+    global _gestor
+    if _gestor is None:
+        with _gestor_lock:
+            if _gestor is None:
+                _gestor = GestorSesionSpark()
+                atexit.register(_gestor.detener)
+    return _gestor
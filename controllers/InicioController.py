@@ -1,8 +1,7 @@
+import threading
 import tkinter as tk
 from tkinter import messagebox
 from views.InicioView import InicioView
-from controllers.PuntoVentaController import PuntoVentaController
-from controllers.SparkController import SparkController
 
 class InicioController:
     def __init__(self):
@@ -16,6 +15,7 @@ class InicioController:
     
     def mostrar_punto_venta(self):
         """Abrir el punto de venta desde el menú del administrador"""
+        from controllers.PuntoVentaController import PuntoVentaController
         punto_venta_controller = PuntoVentaController()
         # Podemos pasar el root actual si queremos manejar ventanas hijas
         # o crear una nueva instancia independiente
@@ -29,6 +29,8 @@ class InicioController:
 
     def mostrar_analisis_spark(self):
         """Abrir el análisis Spark desde el menú"""
+        # PySpark sólo se carga cuando el administrador abre el análisis
+        from controllers.SparkController import SparkController
         spark_controller = SparkController()
         spark_controller.iniciar_analisis()
 
@@ -46,4 +48,21 @@ class InicioController:
         self.root = tk.Tk()
         self.view = InicioView(self.root, self)
         self.view.crear_vista_principal(usuario, rol)
-        self.root.mainloop()
\ No newline at end of file
+        # Con el menú ya visible, la JVM de Spark arranca en segundo plano si hará falta
+        self.root.after(500, self._precalentar_spark)
+        self.root.mainloop()
+
+    def _precalentar_spark(self):
+        # Contar los tickets no debe bloquear el menú: se decide en otro hilo
+        threading.Thread(target=self._precalentar_si_hace_falta, name="ElegirMotor", daemon=True).start()
+
+    def _precalentar_si_hace_falta(self):
+        from analisis.motores import elegir_motor
+        try:
+            if elegir_motor() != "spark":
+                # Con pocos tickets el análisis usa NumPy: no merece la pena arrancar la JVM
+                return
+            from analisis.sesion_spark import get_gestor_spark
+            get_gestor_spark().precalentar()
+        except Exception as e:
+            print("No se pudo precalentar Spark:", e)
\ No newline at end of file
@@ -1,8 +1,6 @@
 import tkinter as tk
 from tkinter import messagebox
 from db.conexion import get_db
-from controllers.PuntoVentaController import PuntoVentaController
-from controllers.InicioController import InicioController
 from views.LoginView import LoginView
 
 class LoginController:
@@ -29,11 +27,13 @@ class LoginController:
                 messagebox.showinfo("Bienvenido", f"Usuario: {usuario}\nRol: {rol}")
                 self.view.cerrar_vista()
                 
-                # Redirigir según el rol
+                # Redirigir según el rol (los módulos se importan aquí para que el login arranque ligero)
                 if rol == "administrador":
+                    from controllers.InicioController import InicioController
                     inicio_controller = InicioController()
                     inicio_controller.iniciar_aplicacion(usuario, rol)
                 else:  # vendedor u otros roles
+                    from controllers.PuntoVentaController import PuntoVentaController
                     punto_venta_controller = PuntoVentaController()
                     punto_venta_controller.iniciar_app(rol)
             else:
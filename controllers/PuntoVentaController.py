@@ -1,24 +1,36 @@
+import queue
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, simpledialog
+from bson import ObjectId
 from db.conexion import get_db
+from db.catalogo import get_catalogo
+from db.ventas import rango_del_dia, PaginadorTickets
+from db.ventas_diarias import resumen_periodo
+from db.escritor_ventas import get_escritor_ventas
 from datetime import datetime
 from views.PuntoVentaView import PuntoVentaView
+from views.ResumenView import ResumenView
+from models.Cuenta import Cuenta
+from models.Catalogo import formatear_precio
 
 class PuntoVentaController:
     def __init__(self):
         self.root = None
         self.view = None
         self.db = None
-        self.collection_areas = None
-        self.collection_productos = None
+        self.catalogo = None
         
         # Variables de estado
         self.areas = []
-        self.productos_por_area = {}
-        self.cuenta_actual = {}
-        self.total_actual = 0
+        # Ids del catálogo en el orden en que se muestran en la lista (área o resultados de búsqueda)
+        self.productos_visibles = ()
+        self.cuenta = Cuenta()
         self.rol_usuario = None
 
+        # Confirmaciones del escritor en segundo plano, leídas desde el hilo de Tk
+        self.respuestas_ventas = queue.Queue()
+        self._sondeo_respuestas = None
+
     def iniciar_app(self, rol_usuario):
         self.rol_usuario = rol_usuario
         self.root = tk.Toplevel() if self._hay_ventana_principal() else tk.Tk()
@@ -26,13 +38,15 @@ class PuntoVentaController:
         
         try:
             self.db = get_db()
-            self.collection_areas = self.db['areas']
-            self.collection_productos = self.db['productos']
+            self.catalogo = get_catalogo()
+            # Arranca el escritor: reenvía las ventas que quedaron en el diario local
+            get_escritor_ventas()
         except Exception as e:
             messagebox.showerror("Error de conexión", f"No se pudo conectar a la base de datos: {str(e)}")
             return
 
         self.view.crear_vista_principal()
+        self.cuenta.suscribir(self.view.aplicar_cambio_cuenta)
         
         # Restricciones por rol
         if rol_usuario == "vendedor":
@@ -40,6 +54,7 @@ class PuntoVentaController:
 
         self.cargar_areas()
         self.actualizar_cuenta()
+        self._revisar_respuestas_ventas()
         
         # Configurar cierre de ventana
         self.root.protocol("WM_DELETE_WINDOW", self.cerrar_ventana)
@@ -55,13 +70,14 @@ class PuntoVentaController:
     def cerrar_ventana(self):
         """Manejar el cierre de la ventana"""
         if messagebox.askyesno("Cerrar", "¿Desea cerrar el punto de venta?"):
+            if self._sondeo_respuestas:
+                self.root.after_cancel(self._sondeo_respuestas)
             self.root.destroy()
 
     # ... (el resto de los métodos se mantienen igual)
     def cargar_areas(self):
         try:
-            areas_cursor = self.collection_areas.find().sort('nombre')
-            self.areas = [area for area in areas_cursor]
+            self.areas = self.catalogo.areas()
             nombres_areas = [area['nombre'] for area in self.areas]
             self.view.actualizar_combo_areas(nombres_areas)
             if nombres_areas:
@@ -77,101 +93,167 @@ class PuntoVentaController:
         area_id = area_seleccionada['_id']
         
         try:
-            productos_cursor = self.collection_productos.find({'area_id': area_id}).sort('nombre')
-            self.productos_por_area = {prod['_id']: prod for prod in productos_cursor}
-            self.view.actualizar_lista_productos(self.productos_por_area.values())
+            self.mostrar_productos(self.catalogo.productos_de_area(area_id))
         except Exception as e:
             messagebox.showerror("Error", f"No se pudieron cargar los productos: {str(e)}")
 
+    def mostrar_productos(self, ids_productos):
+        self.productos_visibles = ids_productos
+        self.view.actualizar_lista_productos(ids_productos, self.catalogo.catalogo)
+
     def on_area_selected(self, event):
         indice_seleccionado = self.view.combo_area.current()
         if indice_seleccionado >= 0:
+            self.view.limpiar_busqueda()
             self.cargar_productos_por_area(indice_seleccionado)
 
+    def on_busqueda(self, event):
+        """Filtra todo el catálogo con cada tecla; sin texto se vuelve al área seleccionada"""
+        texto = self.view.obtener_busqueda()
+        if not texto:
+            self.on_area_selected(event)
+            return
+        try:
+            self.mostrar_productos(self.catalogo.buscar(texto))
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo buscar el producto: {str(e)}")
+
+    def on_codigo_ingresado(self, event):
+        """Enter en el buscador: código de barras exacto o único resultado van directos a la cuenta"""
+        texto = self.view.obtener_busqueda()
+        if not texto:
+            return
+        id_producto = self.catalogo.por_codigo(texto)
+        if id_producto is None and len(self.productos_visibles) == 1:
+            id_producto = self.productos_visibles[0]
+        if id_producto is None:
+            self.view.mostrar_estado(f"⚠️ Sin coincidencia exacta para '{texto}'")
+            return
+        self.agregar_producto(id_producto)
+        self.view.limpiar_busqueda()
+        self.on_area_selected(event)
+
     def on_producto_selected(self, event):
         seleccion = self.view.lista_productos.curselection()
         if seleccion:
-            indice = seleccion[0]
-            producto_id = list(self.productos_por_area.keys())[indice]
-            producto = self.productos_por_area[producto_id]
-            
-            if producto_id in self.cuenta_actual:
-                self.cuenta_actual[producto_id]['cantidad'] += 1
-            else:
-                self.cuenta_actual[producto_id] = {
-                    'nombre': producto['nombre'],
-                    'precio': producto['precio'],
-                    'cantidad': 1
-                }
-            
-            self.total_actual += producto['precio']
-            self.actualizar_cuenta()
+            self.agregar_producto(self.productos_visibles[seleccion[0]])
+
+    def agregar_producto(self, id_producto):
+        catalogo = self.catalogo.catalogo
+        self.cuenta.agregar(id_producto, catalogo.nombres[id_producto], catalogo.precios[id_producto])
 
     def actualizar_cuenta(self):
-        self.view.actualizar_cuenta(self.cuenta_actual, self.total_actual)
+        self.view.actualizar_cuenta(self.cuenta)
+
+    def aumentar_cantidad(self):
+        indice = self.view.linea_seleccionada()
+        if indice is not None:
+            self.cuenta.cambiar_cantidad(indice, self.cuenta.linea(indice).cantidad + 1)
+
+    def disminuir_cantidad(self):
+        indice = self.view.linea_seleccionada()
+        if indice is not None:
+            self.cuenta.cambiar_cantidad(indice, self.cuenta.linea(indice).cantidad - 1)
+
+    def cambiar_cantidad(self):
+        indice = self.view.linea_seleccionada()
+        if indice is None:
+            return
+        linea = self.cuenta.linea(indice)
+        cantidad = simpledialog.askinteger("Cantidad", f"Cantidad de {linea.nombre}:",
+                                           parent=self.root, initialvalue=linea.cantidad, minvalue=0)
+        if cantidad is not None:
+            self.cuenta.cambiar_cantidad(indice, cantidad)
+
+    def quitar_producto(self):
+        indice = self.view.linea_seleccionada()
+        if indice is not None:
+            self.cuenta.quitar(indice)
 
     def atender_cliente(self):
-        if not self.cuenta_actual:
+        if not self.cuenta:
             messagebox.showwarning("Atención", "No hay productos en la cuenta")
             return
         
         try:
-            coleccion_clientes = self.db['clientes']
-            num_clientes = coleccion_clientes.count_documents({})
-            nombre_cliente = f"Cliente {num_clientes + 1}"
-            
+            # El _id se genera aquí para que reintentos y reenvíos del diario no dupliquen el ticket;
+            # el número y el nombre los asigna el escritor al insertarlo
             cliente = {
-                "nombre": nombre_cliente,
-                "productos": list(self.cuenta_actual.values()),
-                "total": self.total_actual,
-                "fecha": datetime.now().isoformat()
+                "_id": ObjectId(),
+                "productos": self.cuenta.lineas(),
+                "total": self.cuenta.total_pesos(),
+                "fecha": datetime.now()
             }
             
-            coleccion_clientes.insert_one(cliente)
-            
-            messagebox.showinfo("Éxito", f"{nombre_cliente} atendido por ${self.total_actual:.2f}")
+            # encolar() no vuelve hasta que el ticket está guardado en el diario local
+            get_escritor_ventas().encolar(cliente, self.respuestas_ventas)
+            self.view.mostrar_estado(f"💾 Venta por {formatear_precio(self.cuenta.total)} guardada, sincronizando...")
             
             # Reiniciar cuenta
-            self.cuenta_actual = {}
-            self.total_actual = 0
-            self.actualizar_cuenta()
+            self.cuenta.vaciar()
             
         except Exception as e:
             messagebox.showerror("Error", f"No se pudo registrar el cliente: {str(e)}")
 
+    def _revisar_respuestas_ventas(self):
+        """Muestra las confirmaciones o fallos que dejó el escritor de ventas"""
+        while True:
+            try:
+                estado, cliente, mensaje = self.respuestas_ventas.get_nowait()
+            except queue.Empty:
+                break
+            if estado == "ok":
+                self.view.mostrar_estado(f"✅ {cliente['nombre']} atendido por ${cliente['total']:.2f}")
+            elif estado == "pendiente":
+                self.view.mostrar_estado("⚠️ Sin conexión con la base de datos: las ventas quedan guardadas "
+                                         "en este equipo y se enviarán al recuperarla")
+            else:
+                self.view.mostrar_estado(f"❌ Venta de ${cliente['total']:.2f} no registrada")
+                messagebox.showerror("Error", f"No se pudo registrar el cliente: {mensaje}")
+        self._sondeo_respuestas = self.root.after(200, self._revisar_respuestas_ventas)
+
     def mostrar_resumen(self):
         try:
-            hoy_str = datetime.now().strftime('%Y-%m-%d')
-            fecha_formateada = datetime.now().strftime('%d/%m/%Y')
+            inicio, fin = rango_del_dia()
+            fecha_formateada = inicio.strftime('%d/%m/%Y')
 
-            clientes_hoy = list(self.db['clientes'].find({'fecha': {'$regex': f'^{hoy_str}'}}))
+            # Del rollup 'ventas_diarias' si está al día; si no, agregando los tickets
+            resumen_dia = resumen_periodo(self.db, inicio, fin)
 
-            if not clientes_hoy:
+            if not resumen_dia['clientes']:
                 messagebox.showinfo("Resumen Diario", f"No hay clientes atendidos el día {fecha_formateada}")
                 return
 
-            total_diario = sum(cliente['total'] for cliente in clientes_hoy)
-            cantidad_ventas = len(clientes_hoy)
+            lineas = [
+                f"RESUMEN DEL DÍA: {fecha_formateada}\n",
+                f"Clientes atendidos: {resumen_dia['clientes']}",
+                f"Total vendido: ${resumen_dia['total']:.2f}",
+                f"Ticket promedio: ${resumen_dia['promedio']:.2f}",
+                f"Venta máxima: ${resumen_dia['maximo']:.2f}\n",
+                "Unidades vendidas por producto:",
+            ]
+            for prod in resumen_dia['productos']:
+                lineas.append(f"   - {prod['nombre']}: {prod['unidades']} (${prod['ingresos']:.2f})")
 
-            resumen = f"RESUMEN DEL DÍA: {fecha_formateada}\n\n"
-            resumen += f"Clientes atendidos: {cantidad_ventas}\n"
-            resumen += f"Total vendido: ${total_diario:.2f}\n\n"
-            resumen += "Detalle de clientes:\n"
+            resumen = "\n".join(lineas)
 
-            for i, cliente in enumerate(clientes_hoy, 1):
-                fecha_dt = datetime.fromisoformat(cliente['fecha'])
-                resumen += f"\n{i}. {cliente['nombre']} - Total: ${cliente['total']:.2f} - {fecha_dt.strftime('%H:%M:%S')}\n"
-                for prod in cliente['productos']:
-                    resumen += f"   - {prod['nombre']} x{prod['cantidad']}\n"
+            # El detalle se lee bajo demanda: sólo las páginas que el usuario llega a ver
+            paginador = PaginadorTickets(self.db, inicio, fin)
+            vista_resumen = ResumenView(tk.Toplevel(self.root), self)
+            vista_resumen.crear_vista(f"Resumen Diario - {fecha_formateada}", resumen,
+                                      resumen_dia['clientes'],
+                                      lambda indice: self._formatear_ticket(paginador, indice))
 
-            ventana_resumen = tk.Toplevel(self.root)
-            ventana_resumen.title(f"Resumen Diario - {fecha_formateada}")
-            ventana_resumen.geometry("500x400")
-
-            texto_resumen = tk.Text(ventana_resumen, wrap=tk.WORD)
-            texto_resumen.pack(fill="both", expand=True, padx=10, pady=10)
-            texto_resumen.insert(1.0, resumen)
-            texto_resumen.config(state="disabled")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudo generar el resumen: {str(e)}")
 
+    def _formatear_ticket(self, paginador, indice):
+        """Texto de una fila del detalle del resumen"""
+        try:
+            cliente = paginador.ticket(indice)
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo generar el resumen: {str(e)}")
\ No newline at end of file
+            return f"{indice + 1}. ⚠️ No se pudo leer el ticket: {str(e)}"
+        if cliente is None:
+            return ""
+        productos = ", ".join(f"{prod['nombre']} x{prod['cantidad']}" for prod in cliente['productos'])
+        return f"{indice + 1}. {cliente['nombre']} - ${cliente['total']:.2f} - {cliente['fecha'].strftime('%H:%M:%S')} | {productos}"
@@ -1,154 +1,163 @@
 import tkinter as tk
 from tkinter import messagebox
-from pyspark.sql import SparkSession
-from pyspark.sql.functions import avg, sum, count, col, desc, explode, max, min
-from pyspark.sql.types import DateType
-import datetime
 import csv
+import datetime
+import queue
+import threading
 from views.SparkView import SparkView
+from analisis.motores import crear_motor, disponible, PRESUPUESTOS_SECCION, FUENTE_PARQUET
+from analisis.cache_resultados import AnalisisConCache
+from analisis.reporte import formatear_reporte, formatear_avance
 
 class SparkController:
     def __init__(self):
         self.root = tk.Toplevel()
         self.view = SparkView(self.root, self)
-        self.spark = None
-        self.df = None
+        # Eventos (tipo, dato) que deja el hilo del análisis: progreso, detalle, parcial, resultado o error
+        self.eventos = queue.Queue()
+        self._hilo_analisis = None
+        self._motor = None
+        self._sondeo_eventos = None
+        self._texto_parcial = None
+        self._paso_actual = 0
         self.view.crear_vista()
+        self.root.protocol("WM_DELETE_WINDOW", self.cerrar_ventana)
 
-    def _conectar_spark(self):
+    def realizar_analisis(self):
+        """Lanza el análisis en un hilo aparte; la ventana sigue atendiendo eventos mientras tanto"""
+        if self._hilo_analisis is not None:
+            return
         try:
-            self.spark = SparkSession.builder \
-                .appName("AnalisisSupermercado") \
-                .config("spark.mongodb.input.uri", "mongodb://localhost:27017/supermercado_db.clientes") \
-                .config("spark.mongodb.output.uri", "mongodb://localhost:27017/supermercado_db.clientes") \
-                .config("spark.jars.packages", "org.mongodb.spark:mongo-spark-connector_2.12:3.0.1") \
-                .getOrCreate()
-            return True
-        except Exception as e:
-            raise Exception(f"Error al conectar con Spark: {str(e)}")
-
-    def _cargar_datos(self):
+            inicio, fin = self._leer_periodo()
+        except ValueError as e:
+            messagebox.showwarning("Periodo inválido", str(e))
+            return
+        if self.view.obtener_fuente() == FUENTE_PARQUET and not disponible("pyarrow"):
+            messagebox.showwarning("Fuente no disponible",
+                                   "Leer la instantánea Parquet necesita pyarrow instalado "
+                                   "(pip install -r requirements.txt). Elige la fuente 'mongo'.")
+            return
+        self.view.deshabilitar_botones()
+        self.view.iniciar_progreso(max_pasos=6, mensaje="Iniciando análisis completo...")
+        self.view.mostrar_progreso("Iniciando análisis completo...")
+        self._texto_parcial = None
+        self._paso_actual = 0
+
+        limite = self.view.obtener_limite_seccion()
+        presupuestos = {clave: limite for clave in PRESUPUESTOS_SECCION} if limite else None
+        motor = self.view.obtener_motor()
+        fuente = self.view.obtener_fuente()
+        # Con los mismos parámetros y sin ventas nuevas se reutiliza el resultado guardado
+        self._motor = AnalisisConCache(
+            lambda **argumentos: crear_motor(motor, presupuestos=presupuestos, fuente=fuente, **argumentos),
+            inicio=inicio, fin=fin, fuente=fuente, motor=motor
+        )
+        self.view.activar_cancelacion(True)
+
+        self._hilo_analisis = threading.Thread(target=self._ejecutar_analisis, name="AnalisisSpark", daemon=True)
+        self._hilo_analisis.start()
+        self._revisar_eventos()
+
+    def _leer_periodo(self):
+        """Convierte las fechas de la vista en el intervalo [inicio, fin); 'hasta' es inclusivo"""
+        desde, hasta = self.view.obtener_periodo()
         try:
-            self.df = self.spark.read \
-                .format("mongo") \
-                .option("uri", "mongodb://localhost:27017/supermercado_db.clientes") \
-                .load()
-            return True
-        except Exception as e:
-            raise Exception(f"Error al cargar datos: {str(e)}")
-
-    def _cerrar_conexion(self):
-        if self.spark:
-            self.spark.stop()
-            self.spark = None
-
-    def realizar_analisis(self):
+            inicio = datetime.datetime.strptime(desde, "%Y-%m-%d") if desde else None
+            fin = datetime.datetime.strptime(hasta, "%Y-%m-%d") + datetime.timedelta(days=1) if hasta else None
+        except ValueError:
+            raise ValueError("Las fechas deben tener el formato AAAA-MM-DD")
+        if inicio and fin and inicio >= fin:
+            raise ValueError("La fecha 'Desde' debe ser anterior o igual a 'Hasta'")
+        return inicio, fin
+
+    def _ejecutar_analisis(self):
+        """Cuerpo del hilo de trabajo: nunca toca widgets, sólo deja eventos en la cola"""
         try:
-            self.view.deshabilitar_botones()
-            total_pasos = 7
-            self.view.iniciar_progreso(max_pasos=total_pasos, mensaje="Iniciando análisis completo...")
-
-            resultado_texto = "=== ANÁLISIS COMPLETO DEL SUPERMERCADO ===\n\n"
-            resultado_texto += f"Fecha del análisis: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
-
-            # Paso 1: Conectar Spark
-            self.view.mostrar_progreso("Conectando con Spark...")
-            self.view.avanzar_progreso(1, total_pasos, "Conectando con Spark...")
-            self._conectar_spark()
-
-            # Paso 2: Cargar datos
-            self.view.mostrar_progreso("Cargando datos desde MongoDB...")
-            self.view.avanzar_progreso(2, total_pasos, "Cargando datos desde MongoDB...")
-            self._cargar_datos()
-            resultado_texto += f"Total de registros: {self.df.count()}\n\n"
-
-            # Paso 3: Procesar fechas
-            self.view.mostrar_progreso("Procesando fechas...")
-            self.view.avanzar_progreso(3, total_pasos, "Procesando fechas...")
-            if 'fecha' in self.df.columns:
-                self.df = self.df.withColumn("fecha_simple", col("fecha").substr(1, 10))
-                self.df = self.df.withColumn("fecha_date", col("fecha_simple").cast(DateType()))
-                fechas = self.df.agg(min("fecha_date").alias("min_fecha"), max("fecha_date").alias("max_fecha")).first()
-                resultado_texto += f"Rango de fechas en los datos:\n   - Desde: {fechas['min_fecha']}\n   - Hasta: {fechas['max_fecha']}\n\n"
-
-            # Paso 4: Día con más ventas
-            self.view.mostrar_progreso("Analizando ventas por día...")
-            self.view.avanzar_progreso(4, total_pasos, "Analizando ventas por día...")
-            if 'fecha_date' in self.df.columns and 'total' in self.df.columns:
-                ventas_por_dia = self.df.groupBy("fecha_date") \
-                    .agg(sum("total").alias("total_ventas"), count("_id").alias("cantidad_ventas")) \
-                    .orderBy(desc("total_ventas"))
-                if ventas_por_dia.count() > 0:
-                    dia_mas_ventas = ventas_por_dia.first()
-                    resultado_texto += f"1. DÍA CON MÁS VENTAS (POR MONTO):\n   - Fecha: {dia_mas_ventas['fecha_date']}\n   - Total vendido: ${dia_mas_ventas['total_ventas']:.2f}\n   - Ventas realizadas: {dia_mas_ventas['cantidad_ventas']}\n\n"
-
-            # Paso 5: Promedios
-            self.view.mostrar_progreso("Calculando promedios...")
-            self.view.avanzar_progreso(5, total_pasos, "Calculando promedios...")
-            if 'fecha_date' in self.df.columns:
-                clientes_por_dia = self.df.groupBy("fecha_date").agg(count("nombre").alias("clientes_dia"))
-                promedio_clientes = clientes_por_dia.select(avg("clientes_dia")).first()[0]
-                resultado_texto += f"2. PROMEDIO DE CLIENTES POR DÍA:\n   - {promedio_clientes:.2f} clientes/día\n\n"
-            if 'total' in self.df.columns:
-                promedio_venta = self.df.select(avg("total")).first()[0]
-                resultado_texto += f"3. PROMEDIO DE VENTA POR CLIENTE:\n   - ${promedio_venta:.2f} por cliente\n\n"
-
-            # Paso 6: Productos
-            self.view.mostrar_progreso("Analizando productos...")
-            self.view.avanzar_progreso(6, total_pasos, "Analizando productos...")
-            if 'productos' in self.df.columns:
-                try:
-                    productos_exploded = self.df.select(explode("productos").alias("producto"))
-                    productos_cantidad = productos_exploded.groupBy("producto.nombre") \
-                        .agg(sum("producto.cantidad").alias("total_vendido"),
-                             sum(col("producto.precio") * col("producto.cantidad")).alias("ingresos_totales")) \
-                        .orderBy(desc("total_vendido")) \
-                        .limit(10)
-                    resultado_texto += "4. PRODUCTOS MÁS VENDIDOS (TOP 10):\n"
-                    for i, row in enumerate(productos_cantidad.collect(), 1):
-                        resultado_texto += f"   {i}. {row['nombre']}: {int(row['total_vendido'])} unidades (${row['ingresos_totales']:.2f})\n"
-                    resultado_texto += "\n"
-                except Exception as e:
-                    resultado_texto += f"4. ERROR en análisis de productos: {str(e)}\n\n"
-
-            # Paso 7: Clientes y estadísticas
-            self.view.mostrar_progreso("Analizando clientes y estadísticas finales...")
-            self.view.avanzar_progreso(7, total_pasos, "Analizando clientes y estadísticas finales...")
-            if 'nombre' in self.df.columns and 'total' in self.df.columns:
-                top_clientes = self.df.groupBy("nombre") \
-                    .agg(sum("total").alias("gasto_total"), count("*").alias("compras_realizadas")) \
-                    .orderBy(desc("gasto_total")).limit(10)
-                resultado_texto += "5. CLIENTES QUE MÁS GASTARON (TOP 10):\n"
-                for i, row in enumerate(top_clientes.collect(), 1):
-                    resultado_texto += f"   {i}. {row['nombre']}: ${row['gasto_total']:.2f} ({row['compras_realizadas']} compras)\n"
-                resultado_texto += "\n"
-                stats = self.df.agg(
-                    count("*").alias("total_ventas"),
-                    sum("total").alias("ingresos_totales"),
-                    avg("total").alias("ticket_promedio"),
-                    max("total").alias("venta_maxima"),
-                    min("total").alias("venta_minima")
-                ).first()
-                resultado_texto += "6. ESTADÍSTICAS GENERALES:\n"
-                resultado_texto += f"   - Total de ventas: {stats['total_ventas']}\n"
-                resultado_texto += f"   - Ingresos totales: ${stats['ingresos_totales']:.2f}\n"
-                resultado_texto += f"   - Ticket promedio: ${stats['ticket_promedio']:.2f}\n"
-                resultado_texto += f"   - Venta máxima: ${stats['venta_maxima']:.2f}\n"
-                resultado_texto += f"   - Venta mínima: ${stats['venta_minima']:.2f}\n"
-
-            # Finalizar
-            self.view.mostrar_resultados(resultado_texto)
-            self.view.finalizar_progreso("Análisis completado exitosamente")
-            self.view.habilitar_botones()
-            self._cerrar_conexion()
-
+            # Una sola lectura de 'clientes', cacheada, para todas las secciones
+            resultado = self._motor.analizar(
+                progreso=lambda paso, total, mensaje: self.eventos.put(("progreso", (paso, total, mensaje))),
+                parcial=lambda resultado: self.eventos.put(("parcial", resultado)),
+                detalle=lambda estado: self.eventos.put(("detalle", estado))
+            )
+            self.eventos.put(("resultado", resultado))
         except Exception as e:
-            self.view.habilitar_botones()
-            self.view.mostrar_error(f"Error en el análisis: {str(e)}")
-            error_msg = f"Error en el análisis: {str(e)}\n\n"
-            error_msg += "Asegúrate de que:\n1. MongoDB esté ejecutándose en localhost:27017\n2. La base de datos 'supermercado' exista\n3. La colección 'clientes' exista y tenga datos\n4. Los datos tengan la estructura correcta\n\n"
-            error_msg += f"Error detallado: {type(e).__name__}"
-            messagebox.showerror("Error", error_msg)
+            self.eventos.put(("error", e))
+
+    def _revisar_eventos(self):
+        """Vacía la cola de eventos del análisis desde el hilo de Tk"""
+        terminado = False
+        while True:
+            try:
+                tipo, dato = self.eventos.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "detalle":
+                # El monitor puede entregar una lectura tardía de la sección anterior
+                if dato['paso'] >= self._paso_actual:
+                    self.view.mostrar_avance_spark(dato, formatear_avance(dato))
+            elif tipo == "progreso":
+                paso, total, mensaje = dato
+                self._paso_actual = paso
+                # Al empezar una sección la barra marca su comienzo; el avance real llega por "detalle"
+                self.view.avanzar_progreso(paso - 1, total, mensaje)
+                if self._texto_parcial:
+                    self.view.mostrar_parcial(self._texto_parcial, mensaje)
+                else:
+                    self.view.mostrar_progreso(mensaje)
+            elif tipo == "parcial":
+                self._texto_parcial = formatear_reporte(dato)
+            elif tipo == "resultado":
+                self.view.mostrar_resultados(formatear_reporte(dato))
+                self.view.habilitar_botones()
+                if dato['cancelado']:
+                    self.view.finalizar_progreso("Análisis cancelado: se muestran los resultados parciales")
+                elif any(s['estado'] == "error" for s in dato['secciones']):
+                    self.view.finalizar_progreso("Análisis parcial: alguna sección terminó con error")
+                elif any(s['estado'] != "completa" for s in dato['secciones']):
+                    self.view.finalizar_progreso("Análisis parcial: alguna sección superó su límite de tiempo")
+                else:
+                    self.view.finalizar_progreso("Análisis completado exitosamente")
+                terminado = True
+            else:
+                self._mostrar_error_analisis(dato)
+                terminado = True
+
+        if terminado:
+            self.view.activar_cancelacion(False)
+            self._hilo_analisis = None
+            self._motor = None
+            self._sondeo_eventos = None
+        else:
+            self._sondeo_eventos = self.root.after(100, self._revisar_eventos)
+
+    def _mostrar_error_analisis(self, e):
+        self.view.habilitar_botones()
+        self.view.mostrar_error(f"Error en el análisis: {str(e)}")
+        error_msg = f"Error en el análisis: {str(e)}\n\n"
+        error_msg += "Asegúrate de que:\n1. MongoDB esté ejecutándose en localhost:27017\n2. La base de datos 'supermercado' exista\n3. La colección 'clientes' exista y tenga datos\n4. Los datos tengan la estructura correcta\n\n"
+        error_msg += f"Error detallado: {type(e).__name__}"
+        messagebox.showerror("Error", error_msg)
+
+    def cancelar_analisis(self):
+        """Cancela los jobs de Spark de la sección en curso; el resto de secciones se omite"""
+        if self._motor is None:
+            return
+        self.view.activar_cancelacion(False)
+        self.view.actualizar_estado("Cancelando análisis...")
+        # cancelJobGroup sólo avisa al planificador: no bloquea la ventana
+        self._motor.cancelar()
+
+    def cerrar_ventana(self):
+        """Cierra la ventana cancelando el análisis en curso, si lo hay"""
+        if self._motor is not None:
+            try:
+                self._motor.cancelar()
+            except Exception as e:
+                print("No se pudo cancelar el análisis:", e)
+        if self._sondeo_eventos:
+            self.root.after_cancel(self._sondeo_eventos)
+            self._sondeo_eventos = None
+        self.root.destroy()
 
     def exportar_resultados(self):
         try:
@@ -0,0 +1,117 @@
+import threading
+import time
+from db.conexion import get_db
+from models.Catalogo import Catalogo
+from models.IndiceProductos import IndiceProductos
+
+# Segundos que una copia del catálogo se considera vigente si no hay change streams
+TTL_CATALOGO = 300
+
+
+class CatalogoCache:
+    """Copia en memoria de áreas y productos compartida por todas las ventanas del proceso"""
+
+    def __init__(self, ttl=TTL_CATALOGO):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._areas = None
+        self.catalogo = Catalogo()
+        self._indice = None
+        self._cargado_en = 0
+        self._vigilante = None
+        self._vigilando = False
+
+    def _cargar(self):
+        """Lee el catálogo completo en dos consultas y lo vuelca en el catálogo compacto"""
+        db = get_db()
+        areas = list(db['areas'].find().sort('nombre'))
+        # Los documentos se consumen en streaming: sólo quedan los arrays del catálogo
+        productos = db['productos'].find(
+            {}, {'nombre': 1, 'precio': 1, 'area_id': 1, 'codigo': 1, 'sku': 1}
+        ).sort([('area_id', 1), ('nombre', 1)])
+        self.catalogo.actualizar(productos)
+
+        self._areas = areas
+        self._indice = IndiceProductos(self.catalogo)
+        self._cargado_en = time.monotonic()
+        self._iniciar_vigilante()
+
+    def _vigente(self):
+        if self._areas is None:
+            return False
+        # Con un change stream activo las invalidaciones llegan solas
+        if self._vigilando:
+            return True
+        return time.monotonic() - self._cargado_en < self.ttl
+
+    def _asegurar_cargado(self):
+        """Recarga si hace falta y devuelve (áreas, catálogo, índice) leídos bajo el lock:
+        invalidar() puede vaciar _areas en cuanto se suelta"""
+        with self._lock:
+            if not self._vigente():
+                self._cargar()
+            return self._areas, self.catalogo, self._indice
+
+    def areas(self):
+        """Áreas ordenadas por nombre"""
+        areas, _, _ = self._asegurar_cargado()
+        return areas
+
+    def productos_de_area(self, area_id):
+        """Ids de los productos de un área, ya ordenados por nombre"""
+        _, catalogo, _ = self._asegurar_cargado()
+        return catalogo.por_area.get(area_id, ())
+
+    def buscar(self, texto):
+        """Ids de los productos que coinciden en todo el catálogo, sin distinguir acentos"""
+        _, _, indice = self._asegurar_cargado()
+        return indice.buscar(texto)
+
+    def por_codigo(self, codigo):
+        """Id del producto con ese código de barras/SKU, o None"""
+        _, _, indice = self._asegurar_cargado()
+        return indice.por_codigo(codigo)
+
+    def invalidar(self):
+        """Fuerza una recarga completa en el próximo acceso"""
+        with self._lock:
+            self._areas = None
+
+    def _iniciar_vigilante(self):
+        """Escucha cambios en areas/productos; si el servidor no los soporta se usa el TTL"""
+        if self._vigilante is not None:
+            return
+        self._vigilante = threading.Thread(target=self._vigilar_cambios, daemon=True)
+        self._vigilante.start()
+
+    def _vigilar_cambios(self):
+        filtro = [{'$match': {'ns.coll': {'$in': ['areas', 'productos']}}}]
+        try:
+            with get_db().watch(filtro) as stream:
+                with self._lock:
+                    self._vigilando = True
+                    # Lo cambiado entre la carga y la apertura del stream no llegará por él:
+                    # se recarga una vez ya con el stream abierto
+                    self._areas = None
+                for _ in stream:
+                    self.invalidar()
+        except Exception:
+            # Servidor standalone (sin replica set) o conexión perdida: volvemos al TTL
+            pass
+        finally:
+            self._vigilando = False
+            self._vigilante = None
+
+
+_catalogo = None
+_catalogo_lock = threading.Lock()
+
+
+def get_catalogo():
+    """Devuelve la caché de catálogo compartida del proceso"""
+    global _catalogo
+    if _catalogo is None:
+        with _catalogo_lock:
+            if _catalogo is None:
+                _catalogo = CatalogoCache()
+    return _catalogo
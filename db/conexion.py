@@ -1,14 +1,62 @@
+import atexit
+import threading
 from pymongo import MongoClient
 
-def get_db():
-    try:
-        # Conexión local (puerto por defecto 27017)
-        client = MongoClient("mongodb://localhost:27017/")
+# Configuración de la conexión (puerto por defecto 27017)
+MONGO_URI = "mongodb://localhost:27017/"
+NOMBRE_BD = "supermercado_db"
+
+# Un único cliente por proceso: pymongo ya mantiene su propio pool de sockets
+_client = None
+_lock = threading.Lock()
+
 
-        # Seleccionamos la base de datos
-        db = client["supermercado_db"]
+def get_client():
+    """Devuelve el MongoClient compartido del proceso, creándolo la primera vez"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = MongoClient(
+                    MONGO_URI,
+                    maxPoolSize=20,
+                    minPoolSize=2,
+                    maxIdleTimeMS=300_000,
+                    serverSelectionTimeoutMS=5_000,
+                    connectTimeoutMS=5_000,
+                    socketTimeoutMS=30_000,
+                    heartbeatFrequencyMS=10_000,
+                    appname="supermercado",
+                )
+    return _client
 
-        return db
+
+def get_db():
+    try:
+        # Seleccionamos la base de datos sobre el cliente compartido
+        return get_client()[NOMBRE_BD]
     except Exception as e:
         print("Error al conectar con MongoDB:", e)
         return None
+
+
+def verificar_conexion():
+    """Comprueba que el servidor responde (ping) sin lanzar excepciones"""
+    try:
+        get_client().admin.command("ping")
+        return True
+    except Exception as e:
+        print("MongoDB no responde:", e)
+        return False
+
+
+def cerrar_conexion():
+    """Cierra el cliente compartido y libera su pool de conexiones"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+atexit.register(cerrar_conexion)
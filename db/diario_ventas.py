@@ -0,0 +1,102 @@
+"""Diario local de ventas (SQLite en modo WAL).
+
+Cada ticket se escribe aquí, con fsync, antes de confirmarse al cajero; el escritor
+de ventas lo sube después a MongoDB. Para forzar la sincronización a mano:
+    python -m db.diario_ventas
+"""
+import os
+import sqlite3
+import threading
+import time
+from bson import json_util
+
+RUTA_DIARIO = os.path.join(os.path.expanduser("~"), ".supermercado", "diario_ventas.sqlite3")
+
+# Días que se conservan los tickets ya subidos antes de compactar el diario
+DIAS_RETENCION = 7
+
+
+class DiarioVentas:
+    """Registro de tickets en disco local, pendiente de subir a 'clientes'"""
+
+    def __init__(self, ruta=RUTA_DIARIO):
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        self._lock = threading.Lock()
+        # La misma conexión se usa desde el hilo de Tk y desde el escritor, siempre bajo el lock
+        self._conexion = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._conexion.execute("PRAGMA journal_mode=WAL")
+        self._conexion.execute("PRAGMA synchronous=FULL")
+        self._conexion.execute("""
+            CREATE TABLE IF NOT EXISTS ventas (
+                id TEXT PRIMARY KEY,
+                documento TEXT NOT NULL,
+                creado REAL NOT NULL,
+                enviado REAL
+            )
+        """)
+        self._conexion.execute("CREATE INDEX IF NOT EXISTS ventas_pendientes ON ventas (enviado)")
+
+    def registrar(self, cliente):
+        """Guarda el ticket de forma duradera; al volver ya se puede confirmar la venta"""
+        with self._lock:
+            self._conexion.execute(
+                "INSERT OR IGNORE INTO ventas (id, documento, creado) VALUES (?, ?, ?)",
+                (str(cliente["_id"]), json_util.dumps(cliente), time.time())
+            )
+
+    def actualizar(self, clientes):
+        """Reescribe documentos pendientes (p. ej. tras asignarles número de ticket)"""
+        with self._lock:
+            self._conexion.executemany(
+                "UPDATE ventas SET documento = ? WHERE id = ? AND enviado IS NULL",
+                [(json_util.dumps(cliente), str(cliente["_id"])) for cliente in clientes]
+            )
+
+    def pendientes(self, limite):
+        """Tickets aún no subidos, en orden de registro"""
+        with self._lock:
+            filas = self._conexion.execute(
+                "SELECT documento FROM ventas WHERE enviado IS NULL ORDER BY rowid LIMIT ?", (limite,)
+            ).fetchall()
+        return [json_util.loads(documento) for (documento,) in filas]
+
+    def cantidad_pendientes(self):
+        with self._lock:
+            return self._conexion.execute("SELECT COUNT(*) FROM ventas WHERE enviado IS NULL").fetchone()[0]
+
+    def marcar_enviados(self, ids):
+        with self._lock:
+            self._conexion.executemany(
+                "UPDATE ventas SET enviado = ? WHERE id = ?",
+                [(time.time(), str(_id)) for _id in ids]
+            )
+
+    def compactar(self, dias=DIAS_RETENCION):
+        """Elimina los tickets ya subidos hace más de 'dias' días"""
+        with self._lock:
+            self._conexion.execute("DELETE FROM ventas WHERE enviado < ?", (time.time() - dias * 86400,))
+
+
+_diario = None
+_diario_lock = threading.Lock()
+
+
+def get_diario_ventas():
+    """Diario compartido del proceso"""
+    global _diario
+    if _diario is None:
+        with _diario_lock:
+            if _diario is None:
+                _diario = DiarioVentas()
+    return _diario
+
+
+if __name__ == "__main__":
+    from db.escritor_ventas import get_escritor_ventas
+
+    diario = get_diario_ventas()
+    antes = diario.cantidad_pendientes()
+    print(f"Tickets pendientes: {antes}")
+    get_escritor_ventas().sincronizar()
+    despues = diario.cantidad_pendientes()
+    print(f"✅ {antes - despues} tickets subidos. Pendientes: {despues}")
@@ -0,0 +1,165 @@
+import atexit
+import queue
+import threading
+import time
+from pymongo.errors import BulkWriteError
+from db.conexion import get_db
+from db.diario_ventas import get_diario_ventas
+from db.ventas import get_asignador_tickets
+from db.ventas_diarias import registrar_ventas
+
+# Código de error de MongoDB para clave duplicada: el ticket ya estaba insertado
+CLAVE_DUPLICADA = 11000
+
+
+class EscritorVentas:
+    """Hilo de fondo que sube a MongoDB, por lotes, los tickets registrados en el diario local"""
+
+    def __init__(self, tamano_lote=500, espera_lote=0.2, reintentos=3, espera_inicial=0.5,
+                 intervalo_reintento=30):
+        self.tamano_lote = tamano_lote
+        self.espera_lote = espera_lote
+        self.reintentos = reintentos
+        self.espera_inicial = espera_inicial
+        self.intervalo_reintento = intervalo_reintento
+        self.diario = get_diario_ventas()
+        # _id del ticket -> cola de respuestas de la ventana que lo registró
+        self._respuestas = {}
+        self._respuestas_lock = threading.Lock()
+        self._sincronizacion_lock = threading.Lock()
+        self._cola = queue.Queue()
+        self._hilo = threading.Thread(target=self._bucle, name="EscritorVentas", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, cliente, respuestas):
+        """Registra el ticket en el diario (duradero) y avisa al hilo para que lo suba"""
+        self.diario.registrar(cliente)
+        with self._respuestas_lock:
+            self._respuestas[cliente["_id"]] = respuestas
+        self._cola.put(True)
+
+    def detener(self, timeout=10):
+        """Intenta subir lo pendiente y termina el hilo; lo no subido queda en el diario"""
+        self._cola.put(None)
+        self._hilo.join(timeout)
+
+    def _bucle(self):
+        # Al arrancar se reenvía lo que quedó pendiente de ejecuciones anteriores
+        self.sincronizar()
+        self.diario.compactar()
+        while True:
+            try:
+                aviso = self._cola.get(timeout=self.intervalo_reintento)
+            except queue.Empty:
+                # Sin ventas nuevas: reintento periódico si hay pendientes (base caída)
+                self.sincronizar()
+                continue
+            if aviso is None:
+                self.sincronizar()
+                return
+            # Dejamos que se acumulen las ventas de la ventana de espera en un solo lote
+            time.sleep(self.espera_lote)
+            while True:
+                try:
+                    if self._cola.get_nowait() is None:
+                        self.sincronizar()
+                        return
+                except queue.Empty:
+                    break
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Sube al servidor todos los tickets pendientes del diario; devuelve cuántos subió"""
+        subidos = 0
+        with self._sincronizacion_lock:
+            while True:
+                lote = self.diario.pendientes(self.tamano_lote)
+                if not lote:
+                    return subidos
+                confirmados = self._escribir(lote)
+                if confirmados is None:
+                    return subidos
+                subidos += len(confirmados)
+                if len(lote) < self.tamano_lote:
+                    return subidos
+
+    def _escribir(self, lote):
+        """Inserta un lote; devuelve los tickets confirmados o None si la base no está disponible"""
+        espera = self.espera_inicial
+        for intento in range(1, self.reintentos + 1):
+            try:
+                self._numerar(lote)
+                get_db()['clientes'].insert_many(lote, ordered=False)
+                confirmados, rechazados, nuevos = lote, [], lote
+            except BulkWriteError as e:
+                errores = {err['index']: err for err in e.details.get('writeErrors', [])}
+                # Los duplicados son tickets ya insertados antes (_id generado en cliente): replay idempotente
+                confirmados = [c for i, c in enumerate(lote)
+                               if i not in errores or errores[i]['code'] == CLAVE_DUPLICADA]
+                rechazados = [(lote[i], err['errmsg']) for i, err in errores.items()
+                              if err['code'] != CLAVE_DUPLICADA]
+                nuevos = [c for i, c in enumerate(lote) if i not in errores]
+            except Exception as e:
+                if intento == self.reintentos:
+                    self._notificar(lote, "pendiente", str(e))
+                    return None
+                time.sleep(espera)
+                espera *= 2
+                continue
+
+            self._actualizar_rollup(nuevos)
+            self.diario.marcar_enviados([c["_id"] for c in confirmados])
+            self._notificar(confirmados, "ok")
+            for cliente, mensaje in rechazados:
+                # Un rechazo del servidor no se arregla reintentando: se saca del diario y se avisa
+                self.diario.marcar_enviados([cliente["_id"]])
+                self._notificar([cliente], "error", mensaje)
+            return confirmados
+
+    def _actualizar_rollup(self, nuevos):
+        """Suma los tickets recién insertados a 'ventas_diarias'; los duplicados ya se contaron"""
+        try:
+            registrar_ventas(get_db(), nuevos)
+        except Exception as e:
+            # Los tickets ya están guardados: el rollup se repara con la reconstrucción y, mientras
+            # tanto, las lecturas detectan que no cuadra y agregan los tickets directamente
+            print("No se pudo actualizar ventas_diarias:", e)
+
+    def _numerar(self, lote):
+        """Asigna número y nombre a los tickets que aún no lo tienen y lo guarda en el diario"""
+        sin_numero = [cliente for cliente in lote if "numero" not in cliente]
+        if not sin_numero:
+            return
+        # Un solo $inc para todo el lote; los números se reparten en local
+        numeros = get_asignador_tickets(get_db()).reservar(len(sin_numero))
+        for cliente, numero in zip(sin_numero, numeros):
+            cliente["numero"] = numero
+            cliente["nombre"] = f"Cliente {numero}"
+        # Así un reintento conserva el mismo número aunque el insert anterior sí llegara
+        self.diario.actualizar(sin_numero)
+
+    def _notificar(self, clientes, estado, mensaje=None):
+        for cliente in clientes:
+            with self._respuestas_lock:
+                # Los pendientes siguen esperando su confirmación definitiva
+                if estado == "pendiente":
+                    respuestas = self._respuestas.get(cliente["_id"])
+                else:
+                    respuestas = self._respuestas.pop(cliente["_id"], None)
+            if respuestas is not None:
+                respuestas.put((estado, cliente, mensaje))
+
+
+_escritor = None
+_escritor_lock = threading.Lock()
+
+
+def get_escritor_ventas():
+    """Escritor compartido del proceso; al salir intenta subir lo pendiente"""
+    global _escritor
+    if _escritor is None:
+        with _escritor_lock:
+            if _escritor is None:
+                _escritor = EscritorVentas()
+                atexit.register(_escritor.detener)
+    return _escritor
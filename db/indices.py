@@ -0,0 +1,241 @@
+"""Migraciones de esquema e índices de supermercado_db.
+
+Uso desde la raíz del proyecto:
+    python -m db.indices            # aplica las migraciones pendientes
+    python -m db.indices --explain  # además muestra qué plan usa cada consulta
+"""
+import argparse
+import threading
+from datetime import datetime
+from pymongo import ASCENDING, UpdateOne
+from db.conexion import get_db
+from db.ventas import rango_del_dia, filtro_fecha, sembrar_contador_tickets
+
+COLECCION_METADATOS = "metadatos"
+ID_ESQUEMA = "esquema"
+TAMANO_LOTE = 5000
+
+
+def _deduplicar_usuarios(db):
+    """Borra las copias idénticas de un mismo usuario (el script de carga antiguo insertaba
+    sin comprobar); lanza una excepción si quedan usuarios repetidos con datos distintos"""
+    conflictos = []
+    repetidos = db.usuarios.aggregate([
+        {"$group": {"_id": "$usuario", "ids": {"$push": "$_id"}, "n": {"$sum": 1}}},
+        {"$match": {"n": {"$gt": 1}}},
+    ])
+    for grupo in repetidos:
+        documentos = list(db.usuarios.find({"_id": {"$in": grupo["ids"]}}).sort("_id", ASCENDING))
+        sin_id = [{k: v for k, v in doc.items() if k != "_id"} for doc in documentos]
+        copias = [doc["_id"] for doc, datos in zip(documentos[1:], sin_id[1:]) if datos == sin_id[0]]
+        if copias:
+            db.usuarios.delete_many({"_id": {"$in": copias}})
+            print(f"   Usuario '{grupo['_id']}': {len(copias)} copias idénticas borradas")
+        if len(copias) < len(documentos) - 1:
+            conflictos.append(grupo["_id"])
+    if conflictos:
+        raise Exception(f"usuarios repetidos con datos distintos: {', '.join(map(str, conflictos))}; "
+                        f"deja uno de cada y vuelve a ejecutar python -m db.indices")
+
+
+def _v1_indices_iniciales(db):
+    """Índices para login, catálogo por área y resumen diario"""
+    db.productos.create_index([("area_id", ASCENDING), ("nombre", ASCENDING)], name="area_nombre")
+    db.clientes.create_index([("fecha", ASCENDING)], name="fecha")
+    # El único al final: si hay usuarios repetidos, los otros índices ya quedan creados
+    _deduplicar_usuarios(db)
+    db.usuarios.create_index([("usuario", ASCENDING)], unique=True, name="usuario_unico")
+
+
+def _v2_fecha_como_datetime(db):
+    """Convierte 'clientes.fecha' de texto ISO a datetime BSON, por lotes"""
+    convertidos = 0
+    invalidas = 0
+    ultimo_id = None
+    while True:
+        # Se pagina por _id: las fechas mal formadas siguen siendo string y no deben repetirse
+        filtro = {"fecha": {"$type": "string"}}
+        if ultimo_id is not None:
+            filtro["_id"] = {"$gt": ultimo_id}
+        lote = list(db.clientes.find(filtro, {"fecha": 1}).sort("_id", ASCENDING).limit(TAMANO_LOTE))
+        if not lote:
+            break
+        ultimo_id = lote[-1]["_id"]
+        operaciones = []
+        for doc in lote:
+            try:
+                fecha = datetime.fromisoformat(doc["fecha"])
+            except ValueError:
+                # Una fecha ilegible se deja como está en lugar de abortar la migración
+                invalidas += 1
+                continue
+            # El filtro incluye el valor original: re-ejecutar la migración es inocuo
+            operaciones.append(UpdateOne({"_id": doc["_id"], "fecha": doc["fecha"]}, {"$set": {"fecha": fecha}}))
+        if operaciones:
+            db.clientes.bulk_write(operaciones, ordered=False)
+        convertidos += len(operaciones)
+        print(f"   {convertidos} fechas convertidas...")
+    if invalidas:
+        print(f"⚠️ {invalidas} fechas con formato no reconocido se dejaron como texto")
+
+
+def _v3_indice_fecha_id(db):
+    """Sustituye el índice de fecha por (fecha, _id) para paginar el detalle por clave"""
+    db.clientes.create_index([("fecha", ASCENDING), ("_id", ASCENDING)], name="fecha_id")
+    if "fecha" in db.clientes.index_information():
+        db.clientes.drop_index("fecha")
+
+
+def _v4_contador_tickets(db):
+    """Inicializa la secuencia de tickets con el número de clientes ya registrados"""
+    # El punto de venta también la siembra al reservar el primer número, por si vende
+    # antes de que esta migración llegue a ejecutarse; aquí se corrige además una
+    # secuencia que se hubiera creado desde 0 en versiones anteriores
+    sembrar_contador_tickets(db, solo_si_falta=False)
+
+
+def _v5_indice_codigo_producto(db):
+    """Código de barras/SKU único; 'sparse' porque los productos antiguos no lo tienen"""
+    db.productos.create_index([("codigo", ASCENDING)], unique=True, sparse=True, name="codigo_unico")
+
+
+def _v6_indice_nombre_cliente(db):
+    """Índice por nombre de cliente: al actualizar el análisis en caché se recalcula el gasto
+    exacto sólo de los clientes con tickets nuevos"""
+    db.clientes.create_index([("nombre", ASCENDING)], name="nombre")
+
+
+# Lista ordenada de migraciones: (versión, descripción, función)
+MIGRACIONES = [
+    (1, "Índices iniciales (usuarios, productos, clientes)", _v1_indices_iniciales),
+    (2, "clientes.fecha como datetime BSON", _v2_fecha_como_datetime),
+    (3, "Índice clientes(fecha, _id) para el detalle paginado", _v3_indice_fecha_id),
+    (4, "Contador atómico de tickets", _v4_contador_tickets),
+    (5, "Índice único de código de producto", _v5_indice_codigo_producto),
+    (6, "Índice clientes.nombre para el análisis incremental", _v6_indice_nombre_cliente),
+]
+
+
+def _estado(db):
+    return db[COLECCION_METADATOS].find_one({"_id": ID_ESQUEMA}) or {}
+
+
+def _aplicadas(estado):
+    # Las bases migradas antes de registrar 'aplicadas' sólo guardan la versión
+    return set(estado.get("aplicadas", range(1, estado.get("version", 0) + 1)))
+
+
+def _version_contigua(aplicadas):
+    version = 0
+    while version + 1 in aplicadas:
+        version += 1
+    return version
+
+
+def version_actual(db):
+    """Última migración aplicada sin huecos antes que ella"""
+    return _version_contigua(_aplicadas(_estado(db)))
+
+
+def aplicar_migraciones(db=None, verbose=False):
+    """Aplica en orden las migraciones pendientes y devuelve la versión resultante.
+
+    Una migración fallida no bloquea las siguientes: queda pendiente (con su error en
+    metadatos.esquema.fallos) y se reintenta en el próximo arranque.
+    """
+    db = db if db is not None else get_db()
+    aplicadas = _aplicadas(_estado(db))
+
+    for numero, descripcion, migracion in MIGRACIONES:
+        if numero in aplicadas:
+            continue
+        if verbose:
+            print(f"⏳ Migración {numero}: {descripcion}...")
+        try:
+            migracion(db)
+        except Exception as e:
+            print(f"❌ Migración {numero} ({descripcion}) fallida, se reintentará: {e}")
+            db[COLECCION_METADATOS].update_one(
+                {"_id": ID_ESQUEMA},
+                {"$set": {f"fallos.{numero}": {"error": str(e), "fecha": datetime.now()}}},
+                upsert=True
+            )
+            continue
+        aplicadas.add(numero)
+        db[COLECCION_METADATOS].update_one(
+            {"_id": ID_ESQUEMA},
+            {"$set": {"aplicadas": sorted(aplicadas), "version": _version_contigua(aplicadas),
+                      "actualizado": datetime.now()},
+             "$unset": {f"fallos.{numero}": ""}},
+            upsert=True
+        )
+        if verbose:
+            print(f"✅ Migración {numero} aplicada.")
+
+    return _version_contigua(aplicadas)
+
+
+def aplicar_migraciones_en_segundo_plano():
+    """Lanza las migraciones en un hilo para no retrasar el login (servidor caído o la
+    conversión de fechas de una base grande); devuelve el hilo"""
+    def aplicar():
+        try:
+            aplicar_migraciones()
+        except Exception as e:
+            print("No se pudieron aplicar las migraciones:", e)
+
+    hilo = threading.Thread(target=aplicar, name="Migraciones", daemon=True)
+    hilo.start()
+    return hilo
+
+
+def _consultas_a_explicar():
+    """Consultas críticas de la aplicación, con los mismos filtros que usan los controladores"""
+    inicio, fin = rango_del_dia()
+    return [
+        ("Login", "usuarios", {"usuario": "admin", "password": "1234"}, None),
+        ("Productos por área", "productos", {"area_id": 1}, {"nombre": 1}),
+        ("Resumen diario", "clientes", filtro_fecha(inicio, fin), None),
+    ]
+
+
+def _etapas(plan):
+    """Aplana el árbol winningPlan en la lista de etapas (IXSCAN, FETCH, COLLSCAN...)"""
+    etapas = []
+    while plan:
+        etapas.append(plan.get("stage", "?"))
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return etapas
+
+
+def reporte_explain(db=None):
+    """Devuelve un texto con el plan ganador y las estadísticas de ejecución de cada consulta"""
+    db = db if db is not None else get_db()
+    lineas = []
+    for titulo, coleccion, filtro, orden in _consultas_a_explicar():
+        comando = {"find": coleccion, "filter": filtro}
+        if orden:
+            comando["sort"] = orden
+        explain = db.command("explain", comando, verbosity="executionStats")
+        plan = explain["queryPlanner"]["winningPlan"]
+        stats = explain["executionStats"]
+        lineas.append(
+            f"{titulo} ({coleccion}): {' <- '.join(_etapas(plan))} | "
+            f"claves examinadas: {stats['totalKeysExamined']}, "
+            f"documentos examinados: {stats['totalDocsExamined']}, "
+            f"devueltos: {stats['nReturned']}, "
+            f"{stats['executionTimeMillis']} ms"
+        )
+    return "\n".join(lineas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migraciones de índices de supermercado_db")
+    parser.add_argument("--explain", action="store_true", help="mostrar el plan de las consultas principales")
+    args = parser.parse_args()
+
+    db = get_db()
+    version = aplicar_migraciones(db, verbose=True)
+    print(f"Versión de esquema: {version}")
+    if args.explain:
+        print(reporte_explain(db))
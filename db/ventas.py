@@ -0,0 +1,195 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, time, timedelta
+from pymongo import ReturnDocument
+
+# Números de ticket que cada proceso reserva de una vez (1 = secuencia estricta sin huecos)
+BLOQUE_TICKETS = 1
+
+# Las fechas se guardan como datetime BSON con la hora local del terminal (sin zona),
+# así que los rangos se construyen también con datetimes locales sin zona.
+
+
+def rango_del_dia(dia=None):
+    """Devuelve el intervalo [inicio, fin) que cubre el día indicado (por defecto hoy)"""
+    dia = dia or datetime.now().date()
+    if isinstance(dia, datetime):
+        dia = dia.date()
+    inicio = datetime.combine(dia, time.min)
+    return inicio, inicio + timedelta(days=1)
+
+
+def filtro_fecha(inicio=None, fin=None):
+    """Filtro de MongoDB para 'fecha' en [inicio, fin); los extremos None quedan abiertos"""
+    rango = {}
+    if inicio is not None:
+        rango['$gte'] = inicio
+    if fin is not None:
+        rango['$lt'] = fin
+    return {'fecha': rango} if rango else {}
+
+
+def resumen_ventas(db, inicio, fin):
+    """Agrega en el servidor los totales del periodo y las unidades vendidas por producto"""
+    pipeline = [
+        {'$match': filtro_fecha(inicio, fin)},
+        {'$facet': {
+            'totales': [
+                {'$group': {
+                    '_id': None,
+                    'clientes': {'$sum': 1},
+                    'total': {'$sum': '$total'},
+                    'promedio': {'$avg': '$total'},
+                    'maximo': {'$max': '$total'},
+                }},
+            ],
+            'productos': [
+                {'$unwind': '$productos'},
+                {'$group': {
+                    '_id': '$productos.nombre',
+                    'unidades': {'$sum': '$productos.cantidad'},
+                    'ingresos': {'$sum': {'$multiply': ['$productos.precio', '$productos.cantidad']}},
+                }},
+                {'$sort': {'unidades': -1, '_id': 1}},
+            ],
+        }},
+    ]
+    resultado = next(db['clientes'].aggregate(pipeline), {'totales': [], 'productos': []})
+    totales = resultado['totales'][0] if resultado['totales'] else {}
+    return {
+        'clientes': totales.get('clientes', 0),
+        'total': totales.get('total', 0),
+        'promedio': totales.get('promedio', 0),
+        'maximo': totales.get('maximo', 0),
+        'productos': [
+            {'nombre': p['_id'], 'unidades': p['unidades'], 'ingresos': p['ingresos']}
+            for p in resultado['productos']
+        ],
+    }
+
+
+class PaginadorTickets:
+    """Lee los tickets de un periodo por páginas con paginación por clave (fecha, _id)"""
+
+    PROYECCION = {'nombre': 1, 'total': 1, 'fecha': 1, 'productos.nombre': 1, 'productos.cantidad': 1}
+
+    def __init__(self, db, inicio, fin, tamano_pagina=200, max_paginas=8):
+        self.coleccion = db['clientes']
+        self.filtro = filtro_fecha(inicio, fin)
+        self.tamano_pagina = tamano_pagina
+        self.max_paginas = max_paginas
+        # Página -> (fecha, _id) del último ticket de la página anterior
+        self._claves = {0: None}
+        # Sólo se retienen las últimas páginas usadas: la memoria no crece con el scroll
+        self._paginas = OrderedDict()
+
+    def ticket(self, indice):
+        """Devuelve el ticket en la posición indicada, o None si está fuera del periodo"""
+        numero, posicion = divmod(indice, self.tamano_pagina)
+        pagina = self._pagina(numero)
+        return pagina[posicion] if posicion < len(pagina) else None
+
+    def _pagina(self, numero):
+        if numero in self._paginas:
+            self._paginas.move_to_end(numero)
+            return self._paginas[numero]
+
+        # Partimos de la página conocida más cercana; si es la anterior no hace falta skip
+        base = max(n for n in self._claves if n <= numero)
+        clave = self._claves[base]
+        filtro = self.filtro
+        if clave is not None:
+            fecha, _id = clave
+            filtro = {'$and': [self.filtro, {'$or': [
+                {'fecha': {'$gt': fecha}},
+                {'fecha': fecha, '_id': {'$gt': _id}},
+            ]}]}
+
+        cursor = self.coleccion.find(filtro, self.PROYECCION) \
+            .sort([('fecha', 1), ('_id', 1)]) \
+            .skip((numero - base) * self.tamano_pagina) \
+            .limit(self.tamano_pagina) \
+            .batch_size(self.tamano_pagina)
+        pagina = list(cursor)
+
+        if len(pagina) == self.tamano_pagina:
+            self._claves[numero + 1] = (pagina[-1]['fecha'], pagina[-1]['_id'])
+        self._paginas[numero] = pagina
+        if len(self._paginas) > self.max_paginas:
+            self._paginas.popitem(last=False)
+        return pagina
+
+
+def sembrar_contador_tickets(db, solo_si_falta=True):
+    """Lleva la secuencia de tickets al menos al número de clientes ya registrados; con
+    solo_si_falta no toca una secuencia existente (y se ahorra contar los clientes)"""
+    if solo_si_falta and db['contadores'].find_one({'_id': 'clientes'}, {'_id': 1}) is not None:
+        return
+    # $max: si otro terminal la creó mientras tanto (o ya va por delante) no se retrocede
+    db['contadores'].update_one(
+        {'_id': 'clientes'},
+        {'$max': {'secuencia': db['clientes'].count_documents({})}},
+        upsert=True
+    )
+
+
+class AsignadorTickets:
+    """Reparte números de ticket con un $inc atómico sobre contadores._id='clientes'"""
+
+    def __init__(self, db, bloque=BLOQUE_TICKETS):
+        self.db = db
+        self.contadores = db['contadores']
+        self.bloque = bloque
+        self._lock = threading.Lock()
+        self._sembrado = False
+        self._siguiente = 1
+        self._ultimo = 0
+
+    def _incrementar(self, cantidad):
+        """$inc sobre la secuencia, sembrándola antes si es la primera vez: crearla desde 0
+        repetiría los nombres 'Cliente N' ya vendidos. Devuelve el último número reservado"""
+        if not self._sembrado:
+            sembrar_contador_tickets(self.db)
+            self._sembrado = True
+        contador = self.contadores.find_one_and_update(
+            {'_id': 'clientes'},
+            {'$inc': {'secuencia': cantidad}},
+            return_document=ReturnDocument.AFTER
+        )
+        if contador is None:
+            # Alguien borró el contador después de sembrarlo
+            self._sembrado = False
+            return self._incrementar(cantidad)
+        return contador['secuencia']
+
+    def reservar(self, cantidad):
+        """Devuelve 'cantidad' números: primero los que quedan del rango reservado y el resto
+        con un único $inc, en lugar de una ida y vuelta a la base por ticket. El $inc reserva
+        al menos 'bloque' números; los que sobran quedan para las siguientes llamadas"""
+        with self._lock:
+            restantes = max(0, self._ultimo - self._siguiente + 1)
+            locales = min(restantes, cantidad)
+            numeros = list(range(self._siguiente, self._siguiente + locales))
+            self._siguiente += locales
+            faltan = cantidad - locales
+            if faltan:
+                reservados = max(faltan, self.bloque)
+                self._ultimo = self._incrementar(reservados)
+                primero = self._ultimo - reservados + 1
+                numeros.extend(range(primero, primero + faltan))
+                self._siguiente = primero + faltan
+            return numeros
+
+
+_asignador = None
+_asignador_lock = threading.Lock()
+
+
+def get_asignador_tickets(db):
+    """Asignador compartido por todas las ventanas de punto de venta del proceso"""
+    global _asignador
+    if _asignador is None:
+        with _asignador_lock:
+            if _asignador is None:
+                _asignador = AsignadorTickets(db)
+    return _asignador
@@ -0,0 +1,334 @@
+"""Rollup diario de ventas en 'ventas_diarias': un documento por día con totales, desglose
+por producto y por hora.
+
+El escritor de ventas lo mantiene con incrementos ($inc) al insertar cada lote de tickets;
+la reconstrucción recalcula desde 'clientes' los días cerrados posteriores a la marca de agua.
+
+Uso desde la raíz del proyecto:
+    python -m db.ventas_diarias                       # días cerrados pendientes desde la marca
+    python -m db.ventas_diarias --desde 2024-01-01    # recalcula desde esa fecha
+    python -m db.ventas_diarias --todo --incluir-hoy  # todo el histórico, hoy incluido
+"""
+import argparse
+import threading
+from datetime import datetime, time, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from db.conexion import get_db
+from db.indices import COLECCION_METADATOS
+from db.ventas import filtro_fecha, resumen_ventas
+
+COLECCION = "ventas_diarias"
+ID_MARCA = "ventas_diarias"
+
+# Reparación en curso (una sola a la vez): se lanza al encontrar el rollup descuadrado
+_reparacion = None
+_reparacion_lock = threading.Lock()
+
+
+def clave_producto(nombre):
+    """Nombre del producto apto como clave de subdocumento (sin '.' ni '$')"""
+    return nombre.replace("%", "%25").replace(".", "%2E").replace("$", "%24")
+
+
+def dia_de(fecha):
+    return datetime.combine(fecha.date(), time.min)
+
+
+def _incrementos(clientes):
+    """Agrupa los tickets por día y devuelve {día: update} con sus $inc, $max, $min y $set"""
+    por_dia = {}
+    for cliente in clientes:
+        fecha, total = cliente["fecha"], cliente["total"]
+        dia = dia_de(fecha)
+        update = por_dia.setdefault(dia, {"$inc": {}, "$max": {}, "$min": {}, "$set": {}})
+        inc = update["$inc"]
+        hora = f"{fecha.hour:02d}"
+        inc["clientes"] = inc.get("clientes", 0) + 1
+        inc["total"] = inc.get("total", 0) + total
+        inc[f"horas.{hora}.clientes"] = inc.get(f"horas.{hora}.clientes", 0) + 1
+        inc[f"horas.{hora}.total"] = inc.get(f"horas.{hora}.total", 0) + total
+        update["$max"]["maximo"] = max(update["$max"].get("maximo", total), total)
+        update["$min"]["minimo"] = min(update["$min"].get("minimo", total), total)
+        for producto in cliente["productos"]:
+            clave = clave_producto(producto["nombre"])
+            unidades = f"productos.{clave}.unidades"
+            ingresos = f"productos.{clave}.ingresos"
+            inc[unidades] = inc.get(unidades, 0) + producto["cantidad"]
+            inc[ingresos] = inc.get(ingresos, 0) + producto["precio"] * producto["cantidad"]
+            update["$set"][f"productos.{clave}.nombre"] = producto["nombre"]
+    for update in por_dia.values():
+        # La reconstrucción sólo reemplaza el día si nadie lo incrementó mientras lo recalculaba
+        update["$inc"]["revision"] = 1
+        update["$set"]["actualizado"] = datetime.now()
+    return por_dia
+
+
+def registrar_ventas(db, clientes):
+    """Suma al rollup tickets recién insertados (nunca duplicados: se contarían dos veces)"""
+    if not clientes:
+        return
+    operaciones = [UpdateOne({"_id": dia}, update, upsert=True)
+                   for dia, update in _incrementos(clientes).items()]
+    db[COLECCION].bulk_write(operaciones, ordered=False)
+
+
+def _documento_del_dia(db, inicio):
+    """Recalcula desde 'clientes' el documento de rollup de un día, o None si no hubo ventas"""
+    fin = inicio + timedelta(days=1)
+    pipeline = [
+        {"$match": filtro_fecha(inicio, fin)},
+        {"$facet": {
+            "totales": [
+                {"$group": {
+                    "_id": None,
+                    "clientes": {"$sum": 1},
+                    "total": {"$sum": "$total"},
+                    "maximo": {"$max": "$total"},
+                    "minimo": {"$min": "$total"},
+                }},
+            ],
+            "horas": [
+                {"$group": {
+                    "_id": {"$hour": "$fecha"},
+                    "clientes": {"$sum": 1},
+                    "total": {"$sum": "$total"},
+                }},
+            ],
+            "productos": [
+                {"$unwind": "$productos"},
+                {"$group": {
+                    "_id": "$productos.nombre",
+                    "unidades": {"$sum": "$productos.cantidad"},
+                    "ingresos": {"$sum": {"$multiply": ["$productos.precio", "$productos.cantidad"]}},
+                }},
+            ],
+        }},
+    ]
+    resultado = next(db["clientes"].aggregate(pipeline, allowDiskUse=True), None)
+    if not resultado or not resultado["totales"]:
+        return None
+    totales = resultado["totales"][0]
+    return {
+        "_id": inicio,
+        "clientes": totales["clientes"],
+        "total": totales["total"],
+        "maximo": totales["maximo"],
+        "minimo": totales["minimo"],
+        "horas": {f"{h['_id']:02d}": {"clientes": h["clientes"], "total": h["total"]}
+                  for h in resultado["horas"]},
+        "productos": {clave_producto(p["_id"]): {"nombre": p["_id"], "unidades": p["unidades"],
+                                                 "ingresos": p["ingresos"]}
+                      for p in resultado["productos"]},
+        "actualizado": datetime.now(),
+    }
+
+
+def _reconstruir_dia(db, dia, intentos=3):
+    """Reemplaza el documento de un día por el recalculado, condicionado a su 'revision'.
+
+    Si registrar_ventas() lo incrementa entre la lectura y el reemplazo, el filtro ya no
+    coincide y se vuelve a calcular: nunca se pisa un $inc. Devuelve False si no lo logró.
+    """
+    for _ in range(intentos):
+        actual = db[COLECCION].find_one({"_id": dia}, {"revision": 1})
+        documento = _documento_del_dia(db, dia)
+        if actual is None:
+            if documento is None:
+                return True
+            documento["revision"] = 0
+            try:
+                db[COLECCION].insert_one(documento)
+                return True
+            except DuplicateKeyError:
+                # Un $inc creó el día mientras tanto: se recalcula con él
+                continue
+        # {"revision": None} también coincide con documentos anteriores sin ese campo
+        filtro = {"_id": dia, "revision": actual.get("revision")}
+        if documento is None:
+            if db[COLECCION].delete_one(filtro).deleted_count:
+                return True
+        else:
+            documento["revision"] = actual.get("revision") or 0
+            if db[COLECCION].replace_one(filtro, documento).matched_count:
+                return True
+    return False
+
+
+def marca_de_agua(db):
+    """Primer día que la reconstrucción aún no ha recalculado, o None si nunca se ejecutó"""
+    doc = db[COLECCION_METADATOS].find_one({"_id": ID_MARCA})
+    return doc["hasta"] if doc else None
+
+
+def reconstruir(db=None, desde=None, incluir_hoy=False, verbose=False):
+    """Reemplaza los documentos de rollup desde 'desde' (o la marca de agua) hasta ayer.
+
+    Hoy queda fuera por defecto: los terminales lo siguen incrementando y reemplazarlo
+    perdería las ventas que llegasen mientras se recalcula. Devuelve los días recalculados.
+    """
+    db = db if db is not None else get_db()
+    hoy = dia_de(datetime.now())
+    if desde is None:
+        desde = marca_de_agua(db)
+    if desde is None:
+        primero = db["clientes"].find_one({"fecha": {"$type": "date"}}, {"fecha": 1}, sort=[("fecha", 1)])
+        if primero is None:
+            return 0
+        desde = primero["fecha"]
+    dia = dia_de(desde)
+    limite = hoy + timedelta(days=1) if incluir_hoy else hoy
+
+    recalculados = 0
+    while dia < limite:
+        if not _reconstruir_dia(db, dia):
+            # Día con ventas entrando sin parar: lo repara la comprobación de rollup_vigente
+            print(f"⚠️ No se pudo recalcular {dia:%Y-%m-%d}: se modificó durante la reconstrucción")
+        recalculados += 1
+        dia += timedelta(days=1)
+        # La marca avanza día a día: si se interrumpe, se retoma donde quedó
+        db[COLECCION_METADATOS].update_one(
+            {"_id": ID_MARCA},
+            {"$set": {"hasta": min(dia, hoy), "actualizado": datetime.now()}},
+            upsert=True
+        )
+        if verbose and recalculados % 30 == 0:
+            print(f"⏳ {recalculados} días recalculados (hasta {dia:%Y-%m-%d})...")
+    return recalculados
+
+
+def _filtro_dias(inicio, fin):
+    filtro = {}
+    if inicio is not None:
+        filtro["$gte"] = dia_de(inicio)
+    if fin is not None:
+        filtro["$lt"] = fin
+    return {"_id": filtro} if filtro else {}
+
+
+def reparar(db, inicio=None, fin=None):
+    """Recalcula los días del periodo cuyo número de tickets no cuadra con 'clientes'.
+
+    Cubre lo que la reconstrucción condicionada no puede evitar, como un ticket que ya
+    estaba en 'clientes' al recalcular y cuyo $inc llegó después. Devuelve los días reparados.
+    """
+    pipeline = [
+        {"$match": filtro_fecha(inicio, fin) or {"fecha": {"$type": "date"}}},
+        # Sólo 'fecha': la agrupación sale del índice (fecha, _id) sin leer documentos
+        {"$project": {"_id": 0, "fecha": 1}},
+        {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$fecha"}}, "tickets": {"$sum": 1}}},
+    ]
+    en_clientes = {datetime.strptime(fila["_id"], "%Y-%m-%d"): fila["tickets"]
+                   for fila in db["clientes"].aggregate(pipeline, allowDiskUse=True)}
+    en_rollup = {doc["_id"]: doc["clientes"]
+                 for doc in db[COLECCION].find(_filtro_dias(inicio, fin), {"clientes": 1})}
+    descuadrados = sorted(dia for dia in set(en_clientes) | set(en_rollup)
+                          if en_clientes.get(dia, 0) != en_rollup.get(dia, 0))
+    for dia in descuadrados:
+        _reconstruir_dia(db, dia)
+    return len(descuadrados)
+
+
+def _tickets_con_fecha(db, filtro):
+    """Tickets de 'clientes' que el rollup puede contar: los que tienen 'fecha' datetime"""
+    if filtro:
+        # Un rango de fechas sólo coincide con valores datetime
+        return db["clientes"].count_documents(filtro)
+    # Sin periodo, el conteo de metadatos menos los tickets sin fecha válida (dos rangos
+    # acotados del índice de fecha), que el rollup no incluye nunca
+    sin_fecha = db["clientes"].count_documents({"$or": [{"fecha": None}, {"fecha": {"$type": "string"}}]})
+    return db["clientes"].estimated_document_count() - sin_fecha
+
+
+def _documentos_si_cuadran(db, inicio, fin):
+    documentos = list(db[COLECCION].find(_filtro_dias(inicio, fin)).sort("_id", 1))
+    if sum(doc["clientes"] for doc in documentos) != _tickets_con_fecha(db, filtro_fecha(inicio, fin)):
+        return None
+    return documentos
+
+
+def reparar_en_segundo_plano(inicio=None, fin=None):
+    """Lanza reparar() en un hilo si no hay otra reparación en curso; devuelve el hilo o None"""
+    global _reparacion
+
+    def ejecutar():
+        global _reparacion
+        try:
+            reparados = reparar(get_db(), inicio, fin)
+            if reparados:
+                print(f"Rollup diario: {reparados} días recalculados")
+        except Exception as e:
+            print("No se pudo reparar el rollup diario:", e)
+        finally:
+            with _reparacion_lock:
+                _reparacion = None
+
+    with _reparacion_lock:
+        if _reparacion is not None:
+            return None
+        _reparacion = threading.Thread(target=ejecutar, name="ReparacionRollup", daemon=True)
+        _reparacion.start()
+        return _reparacion
+
+
+def rollup_vigente(db, inicio=None, fin=None):
+    """Documentos de rollup del periodo si cuadran con los tickets, o None si no sirven.
+
+    Sólo vale para periodos de días completos; se comprueba que el número de tickets con
+    fecha del rollup coincida con el de 'clientes' (conteos sobre el índice de fecha, sin
+    leer documentos). Si no cuadra, los días descuadrados se reparan en segundo plano para
+    que la siguiente consulta pueda usarlo; ésta no espera a la reparación.
+    """
+    if (inicio is not None and inicio != dia_de(inicio)) or (fin is not None and fin != dia_de(fin)):
+        return None
+    documentos = _documentos_si_cuadran(db, inicio, fin)
+    if documentos is None:
+        reparar_en_segundo_plano(inicio, fin)
+    return documentos
+
+
+def productos_de_rollup(documentos):
+    """{nombre: {unidades, ingresos}} sumando el desglose por producto de varios días"""
+    productos = {}
+    for doc in documentos:
+        for producto in doc.get("productos", {}).values():
+            acumulado = productos.setdefault(producto["nombre"], {"unidades": 0, "ingresos": 0})
+            acumulado["unidades"] += producto["unidades"]
+            acumulado["ingresos"] += producto["ingresos"]
+    return productos
+
+
+def resumen_periodo(db, inicio, fin):
+    """Mismo formato que resumen_ventas, leído del rollup si está al día"""
+    documentos = rollup_vigente(db, inicio, fin)
+    if documentos is None:
+        return resumen_ventas(db, inicio, fin)
+    clientes = sum(doc["clientes"] for doc in documentos)
+    total = sum(doc["total"] for doc in documentos)
+    productos = sorted(productos_de_rollup(documentos).items(), key=lambda p: (-p[1]["unidades"], p[0]))
+    return {
+        'clientes': clientes,
+        'total': total,
+        'promedio': total / clientes if clientes else 0,
+        'maximo': max((doc["maximo"] for doc in documentos), default=0),
+        'productos': [
+            {'nombre': nombre, 'unidades': datos['unidades'], 'ingresos': datos['ingresos']}
+            for nombre, datos in productos
+        ],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstrucción del rollup 'ventas_diarias'")
+    parser.add_argument("--desde", type=lambda t: datetime.strptime(t, "%Y-%m-%d"),
+                        help="primer día a recalcular (AAAA-MM-DD); por defecto, la marca de agua")
+    parser.add_argument("--todo", action="store_true", help="recalcular desde el primer ticket")
+    parser.add_argument("--incluir-hoy", action="store_true",
+                        help="recalcular también hoy (sólo sin terminales vendiendo)")
+    args = parser.parse_args()
+
+    db = get_db()
+    if args.todo:
+        db[COLECCION_METADATOS].delete_one({"_id": ID_MARCA})
+    dias = reconstruir(db, desde=args.desde, incluir_hoy=args.incluir_hoy, verbose=True)
+    print(f"✅ {dias} días recalculados. Marca de agua: {marca_de_agua(db)}")
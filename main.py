@@ -1,5 +1,9 @@
 from controllers.LoginController import LoginController
+from db.indices import aplicar_migraciones_en_segundo_plano
 
 if __name__ == "__main__":
+    # Las migraciones no bloquean el login: si falla la base, el login mostrará el error
+    aplicar_migraciones_en_segundo_plano()
+
     login_controller = LoginController()
-    login_controller.mostrar_login()
\ No newline at end of file
+    login_controller.mostrar_login()
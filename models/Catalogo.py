@@ -0,0 +1,58 @@
+from array import array
+
+
+def a_centavos(precio):
+    """Convierte un precio en pesos (int/float de MongoDB) a centavos enteros"""
+    return int(round(precio * 100))
+
+
+def formatear_precio(centavos):
+    return f"${centavos // 100}.{centavos % 100:02d}"
+
+
+class Catalogo:
+    """Catálogo compacto en arrays paralelos indexados por un id entero denso"""
+
+    def __init__(self):
+        # Los ids son estables mientras viva el proceso: una recarga reutiliza el id de cada
+        # ObjectId ya conocido, así que una cuenta abierta sigue apuntando al mismo producto
+        self.nombres = []
+        self.precios = array('q')      # centavos
+        self.areas = []                # area_id de cada producto (entero u ObjectId)
+        self.codigos = []              # código de barras/SKU o None
+        self.activos = bytearray()     # 0 si el producto desapareció en la última recarga
+        self.por_area = {}             # area_id -> array de ids ordenados por nombre
+        self._ids = {}                 # ObjectId -> id denso
+
+    def __len__(self):
+        return len(self.nombres)
+
+    def actualizar(self, productos):
+        """Vuelca los documentos de 'productos' (ordenados por área y nombre) en los arrays"""
+        self.activos = bytearray(len(self.nombres))
+        por_area = {}
+        for producto in productos:
+            id_producto = self._ids.get(producto['_id'])
+            codigo = producto.get('codigo') or producto.get('sku')
+            if id_producto is None:
+                id_producto = len(self.nombres)
+                self._ids[producto['_id']] = id_producto
+                self.nombres.append(producto['nombre'])
+                self.precios.append(a_centavos(producto['precio']))
+                self.areas.append(producto['area_id'])
+                self.codigos.append(codigo)
+                self.activos.append(1)
+            else:
+                self.nombres[id_producto] = producto['nombre']
+                self.precios[id_producto] = a_centavos(producto['precio'])
+                self.areas[id_producto] = producto['area_id']
+                self.codigos[id_producto] = codigo
+                self.activos[id_producto] = 1
+            por_area.setdefault(producto['area_id'], array('l')).append(id_producto)
+        self.por_area = por_area
+
+    def ids_activos(self):
+        return [i for i, activo in enumerate(self.activos) if activo]
+
+    def etiqueta(self, id_producto):
+        return f"{self.nombres[id_producto]} - {formatear_precio(self.precios[id_producto])}"
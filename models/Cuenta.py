@@ -0,0 +1,101 @@
+class LineaCuenta:
+    """Línea de la cuenta: producto del catálogo, precio en centavos al momento de venderlo y cantidad"""
+
+    __slots__ = ('producto_id', 'nombre', 'precio', 'cantidad')
+
+    def __init__(self, producto_id, nombre, precio, cantidad):
+        self.producto_id = producto_id
+        self.nombre = nombre
+        self.precio = precio
+        self.cantidad = cantidad
+
+    @property
+    def importe(self):
+        return self.precio * self.cantidad
+
+
+class Cuenta:
+    """Cuenta en curso: avisa a sus suscriptores de cada cambio de línea para no repintarla entera"""
+
+    # Eventos que reciben los suscriptores como callback(evento, indice, dato)
+    AGREGADA = "agregada"
+    MODIFICADA = "modificada"
+    ELIMINADA = "eliminada"
+    VACIADA = "vaciada"
+    TOTAL = "total"
+
+    def __init__(self):
+        self._lineas = []
+        self._indices = {}
+        self._suscriptores = []
+        # Total en centavos: la suma de enteros no acumula errores de redondeo
+        self.total = 0
+
+    def suscribir(self, callback):
+        self._suscriptores.append(callback)
+
+    def __len__(self):
+        return len(self._lineas)
+
+    def linea(self, indice):
+        return self._lineas[indice]
+
+    def lineas(self):
+        """Copia de las líneas con el formato que se guarda en 'clientes.productos' (precio en pesos)"""
+        return [{'nombre': l.nombre, 'precio': l.precio / 100, 'cantidad': l.cantidad}
+                for l in self._lineas]
+
+    def total_pesos(self):
+        return self.total / 100
+
+    def agregar(self, producto_id, nombre, precio, cantidad=1):
+        """Suma unidades de un producto; si ya estaba en la cuenta sólo cambia su línea"""
+        indice = self._indices.get(producto_id)
+        if indice is not None:
+            self.cambiar_cantidad(indice, self._lineas[indice].cantidad + cantidad)
+            return indice
+
+        linea = LineaCuenta(producto_id, nombre, precio, cantidad)
+        self._lineas.append(linea)
+        indice = len(self._lineas) - 1
+        self._indices[producto_id] = indice
+        self._emitir(self.AGREGADA, indice, linea)
+        self._actualizar_total(precio * cantidad)
+        return indice
+
+    def cambiar_cantidad(self, indice, cantidad):
+        """Fija la cantidad de una línea; con 0 o menos la línea se quita"""
+        if cantidad <= 0:
+            self.quitar(indice)
+            return
+        linea = self._lineas[indice]
+        diferencia = cantidad - linea.cantidad
+        if diferencia == 0:
+            return
+        linea.cantidad = cantidad
+        self._emitir(self.MODIFICADA, indice, linea)
+        self._actualizar_total(linea.precio * diferencia)
+
+    def quitar(self, indice):
+        linea = self._lineas.pop(indice)
+        del self._indices[linea.producto_id]
+        # Sólo se desplazan las posiciones de las líneas posteriores
+        for posterior in self._lineas[indice:]:
+            self._indices[posterior.producto_id] -= 1
+        self._emitir(self.ELIMINADA, indice, linea)
+        self._actualizar_total(-linea.importe)
+
+    def vaciar(self):
+        self._lineas = []
+        self._indices = {}
+        self.total = 0
+        self._emitir(self.VACIADA, None, None)
+        self._emitir(self.TOTAL, None, self.total)
+
+    def _actualizar_total(self, diferencia):
+        self.total += diferencia
+        self._emitir(self.TOTAL, None, self.total)
+
+    def _emitir(self, evento, indice, dato):
+        for callback in self._suscriptores:
+            callback(evento, indice, dato)
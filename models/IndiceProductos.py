@@ -0,0 +1,62 @@
+import bisect
+import re
+import unicodedata
+from array import array
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, para que 'platano' encuentre 'Plátano'"""
+    descompuesto = unicodedata.normalize("NFKD", texto.lower())
+    return "".join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+def _palabras(texto):
+    return re.findall(r"\w+", normalizar(texto))
+
+
+class IndiceProductos:
+    """Índice en memoria del catálogo: prefijos de palabra sin acentos y código de barras/SKU"""
+
+    def __init__(self, catalogo):
+        self._catalogo = catalogo
+        ids = catalogo.ids_activos()
+        # Lista ordenada de (palabra, id): un prefijo es un rango contiguo que se localiza con bisect
+        entradas = sorted(
+            (palabra, id_producto)
+            for id_producto in ids
+            for palabra in set(_palabras(catalogo.nombres[id_producto]))
+        )
+        self._palabras = [palabra for palabra, _ in entradas]
+        self._ids = array('l', (id_producto for _, id_producto in entradas))
+        # Rango de cada id en el orden alfabético global, para ordenar resultados sin renormalizar
+        orden = sorted(ids, key=lambda i: normalizar(catalogo.nombres[i]))
+        self._rango = {id_producto: posicion for posicion, id_producto in enumerate(orden)}
+        self._por_codigo = {
+            str(catalogo.codigos[id_producto]).strip(): id_producto
+            for id_producto in ids
+            if catalogo.codigos[id_producto]
+        }
+
+    def _con_prefijo(self, prefijo):
+        inicio = bisect.bisect_left(self._palabras, prefijo)
+        # '\uffff' ordena después de cualquier continuación del prefijo
+        fin = bisect.bisect_right(self._palabras, prefijo + "\uffff", inicio)
+        return set(self._ids[inicio:fin])
+
+    def buscar(self, texto):
+        """Ids de los productos cuyas palabras empiezan por cada palabra buscada, por nombre"""
+        palabras = _palabras(texto)
+        if not palabras:
+            return []
+        # Empezamos por la palabra más larga, que suele ser la más selectiva
+        palabras.sort(key=len, reverse=True)
+        ids = self._con_prefijo(palabras[0])
+        for palabra in palabras[1:]:
+            if not ids:
+                break
+            ids &= self._con_prefijo(palabra)
+        return sorted(ids, key=self._rango.__getitem__)
+
+    def por_codigo(self, codigo):
+        """Id del producto con ese código de barras o SKU, o None"""
+        return self._por_codigo.get(codigo.strip())
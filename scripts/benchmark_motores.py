@@ -0,0 +1,132 @@
+"""Compara los motores de análisis (numpy, spark, mongo) con varios tamaños de datos.
+
+Genera tickets sintéticos en una colección aparte (nunca toca 'clientes'), la va llenando
+hasta cada tamaño pedido y ejecuta sobre ella el análisis completo con cada motor, sin
+rollup ni límites por sección. Comprueba además que todos den el mismo resultado.
+
+Uso desde la raíz del proyecto:
+    python -m scripts.benchmark_motores [--tamanos 10000 100000 1000000] [--motores numpy mongo]
+                                         [--repeticiones 3] [--conservar]
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from db.conexion import get_db, verificar_conexion
+from analisis.motores import PRESUPUESTOS_SECCION, crear_motor, disponible
+
+COLECCION = "clientes_benchmark"
+TAMANO_LOTE = 10_000
+
+
+def catalogo(cantidad=200, semilla=7):
+    generador = random.Random(semilla)
+    return [{"nombre": f"Producto {i}", "precio": generador.randint(5, 300)} for i in range(1, cantidad + 1)]
+
+
+def generar_ticket(numero, productos, ahora, generador):
+    """Ticket como los del punto de venta: 1-5 productos y fecha en los últimos 90 días"""
+    lineas = []
+    total = 0
+    for producto in generador.sample(productos, generador.randint(1, 5)):
+        cantidad = generador.randint(1, 5)
+        total += producto["precio"] * cantidad
+        lineas.append({"nombre": producto["nombre"], "precio": producto["precio"], "cantidad": cantidad})
+    return {
+        # Menos clientes que tickets para que la agrupación por cliente tenga trabajo
+        "nombre": f"Cliente {generador.randint(1, max(1, numero // 3))}",
+        "productos": lineas,
+        "total": total,
+        "fecha": ahora - timedelta(days=generador.randint(0, 89), minutes=generador.randint(0, 1439)),
+    }
+
+
+def llenar_hasta(coleccion, tamano, productos, generador):
+    """Inserta tickets hasta que la colección tenga 'tamano' documentos"""
+    ahora = datetime.now().replace(microsecond=0)
+    actuales = coleccion.estimated_document_count()
+    while actuales < tamano:
+        lote = [generar_ticket(actuales + i + 1, productos, ahora, generador)
+                for i in range(min(TAMANO_LOTE, tamano - actuales))]
+        coleccion.insert_many(lote, ordered=False)
+        actuales += len(lote)
+        print(f"⏳ {actuales} / {tamano} tickets generados", end="\r")
+    print()
+
+
+def huella(resultado):
+    """Lo que debe coincidir entre motores, redondeado para evitar diferencias de coma flotante"""
+    estadisticas = resultado.get('estadisticas') or {}
+    return (
+        resultado['total_registros'],
+        round(estadisticas.get('ingresos') or 0, 2),
+        len(resultado.get('ventas_por_dia') or {}),
+        sorted((nombre, datos['unidades']) for nombre, datos in (resultado.get('productos') or {}).items()),
+        [round(c['gasto'], 2) for c in resultado.get('clientes') or []],
+    )
+
+
+def medir(nombre, repeticiones):
+    """Mejor tiempo de 'repeticiones' análisis completos y el último resultado"""
+    sin_limites = {clave: None for clave in PRESUPUESTOS_SECCION}
+    mejor, resultado = None, None
+    for _ in range(repeticiones):
+        motor = crear_motor(nombre, coleccion=COLECCION, usar_rollup=False, presupuestos=sin_limites)
+        inicio = time.perf_counter()
+        resultado = motor.analizar()
+        segundos = time.perf_counter() - inicio
+        mejor = segundos if mejor is None else min(mejor, segundos)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comparativa de los motores de análisis")
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="número de tickets de cada medición")
+    parser.add_argument("--motores", nargs="+", choices=["numpy", "spark", "mongo"],
+                        help="motores a comparar (por defecto, todos los instalados)")
+    parser.add_argument("--repeticiones", type=int, default=3, help="se toma el mejor tiempo")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--conservar", action="store_true", help=f"no borrar '{COLECCION}' al terminar")
+    args = parser.parse_args()
+
+    if not verificar_conexion():
+        print("❌ No se pudo conectar a MongoDB en localhost:27017.")
+        return 1
+    motores = args.motores or ["mongo"] + [nombre for nombre, modulo in (("numpy", "numpy"), ("spark", "pyspark"))
+                                           if disponible(modulo)]
+
+    if "spark" in motores:
+        # El arranque de la JVM se mide aparte: la aplicación lo hace en segundo plano
+        from analisis.sesion_spark import get_gestor_spark
+        inicio = time.perf_counter()
+        get_gestor_spark().obtener().range(1).count()
+        print(f"Arranque de Spark: {time.perf_counter() - inicio:.2f} s\n")
+
+    coleccion = get_db()[COLECCION]
+    coleccion.drop()
+    productos = catalogo()
+    generador = random.Random(args.semilla)
+    correcto = True
+    try:
+        print(f"{'tickets':>10} {'motor':>6} {'segundos':>9} {'tickets/s':>11}  resultado")
+        for tamano in sorted(args.tamanos):
+            llenar_hasta(coleccion, tamano, productos, generador)
+            referencia = None
+            for nombre in motores:
+                segundos, resultado = medir(nombre, args.repeticiones)
+                if referencia is None:
+                    referencia = huella(resultado)
+                igual = huella(resultado) == referencia
+                correcto = correcto and igual
+                print(f"{tamano:>10} {nombre:>6} {segundos:9.2f} {tamano / segundos:11.0f}  "
+                      f"{'✅' if igual else '❌ distinto de ' + motores[0]}")
+    finally:
+        if not args.conservar:
+            coleccion.drop()
+    return 0 if correcto else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,28 @@
 import random
 from datetime import datetime, timedelta
-from db.conexion import get_db
+from db.conexion import get_db, verificar_conexion
+from db.indices import aplicar_migraciones, COLECCION_METADATOS
+from db.ventas_diarias import reconstruir, ID_MARCA
 
 # --------------------------------------------------------------------------------------
 # 1. Conectar a la base de datos
 # --------------------------------------------------------------------------------------
 db = get_db()
+if not verificar_conexion():
+    raise SystemExit("❌ No se pudo conectar a MongoDB en localhost:27017.")
 print("✅ Conexión a la base de datos establecida.")
 
 # --------------------------------------------------------------------------------------
 # 2. Poblar la colección 'usuarios'
 # --------------------------------------------------------------------------------------
 usuarios = db["usuarios"]
-usuarios.insert_many([
+# Upsert por nombre de usuario: 'usuarios.usuario' tiene índice único (ver db/indices.py)
+for usuario in [
     {"usuario": "admin", "password": "1234", "rol": "administrador"},
     {"usuario": "vendedor1", "password": "1234", "rol": "vendedor"},
     {"usuario": "vendedor2", "password": "1234", "rol": "vendedor"},
-])
+]:
+    usuarios.update_one({"usuario": usuario["usuario"]}, {"$set": usuario}, upsert=True)
 print("✅ Colección 'usuarios' poblada.")
 
 # --------------------------------------------------------------------------------------
@@ -141,9 +147,22 @@ productos = [
     {"nombre": "Adaptador", "precio": 35, "area_id": 11},
     {"nombre": "Mouse Inalámbrico", "precio": 150, "area_id": 11}
 ]
+def codigo_ean13(numero: int) -> str:
+    """Genera un EAN-13 de prueba (prefijo 750) con su dígito verificador."""
+    base = f"750{numero:09d}"
+    suma = sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(base))
+    return base + str((10 - suma % 10) % 10)
+
+for i, producto in enumerate(productos, 1):
+    producto["codigo"] = codigo_ean13(i)
+
 db.productos.insert_many(productos)
 print("✅ Colección 'productos' poblada.")
 
+# Crear los índices que esperan los controladores (drop() elimina los de 'productos')
+db.metadatos.delete_one({"_id": "esquema"})
+aplicar_migraciones(db, verbose=True)
+
 # --------------------------------------------------------------------------------------
 # 4. Poblar la colección 'clientes' con datos generados aleatoriamente
 # --------------------------------------------------------------------------------------
@@ -175,7 +194,7 @@ def generar_cliente(id_cliente: int, productos_db):
         "nombre": f"Cliente {id_cliente}",
         "productos": productos_finales,
         "total": total,
-        "fecha": fecha.isoformat()
+        "fecha": fecha
     }
 
 def poblar_clientes(n=500_000, batch_size=5000):
@@ -195,6 +214,14 @@ def poblar_clientes(n=500_000, batch_size=5000):
         coleccion_clientes.insert_many(batch)
         print(f"✅ Insertados {i + len(batch)} / {n} clientes")
 
+    # Los tickets nuevos del punto de venta deben continuar después de "Cliente {n}"
+    db["contadores"].update_one({"_id": "clientes"}, {"$max": {"secuencia": n}}, upsert=True)
+
+    # Rollup diario de todo el histórico generado (aquí no hay terminales vendiendo: hoy incluido)
+    db[COLECCION_METADATOS].delete_one({"_id": ID_MARCA})
+    dias = reconstruir(db, incluir_hoy=True, verbose=True)
+    print(f"✅ Rollup 'ventas_diarias' recalculado: {dias} días")
+
 # Iniciar el proceso de poblado
 if __name__ == "__main__":
     poblar_clientes()
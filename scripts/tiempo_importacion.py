@@ -0,0 +1,79 @@
+"""Comprueba cuánto cuesta importar lo necesario para mostrar el login.
+
+Ejecuta `python -X importtime -c "import main"` en un proceso limpio, muestra los módulos
+más costosos y termina con código 1 si se supera el presupuesto o si se cargó algún
+subsistema pesado que sólo debería importarse al abrir su menú.
+
+Uso desde la raíz del proyecto:
+    python scripts/tiempo_importacion.py [--presupuesto-ms 300] [--top 15]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos que no deben cargarse antes de iniciar sesión
+PROHIBIDOS = [
+    "pyspark",
+    "py4j",
+    "controllers.SparkController",
+    "views.SparkView",
+    "controllers.InicioController",
+    "controllers.PuntoVentaController",
+    "views.PuntoVentaView",
+]
+
+
+def medir_importacion(modulo="main"):
+    """Devuelve {módulo: (propio_us, acumulado_us)} según -X importtime"""
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        raise RuntimeError(proceso.stderr.strip().splitlines()[-1])
+
+    tiempos = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        tiempos[nombre.strip()] = (int(propio), int(acumulado))
+    return tiempos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Regresión del tiempo de importación del login")
+    parser.add_argument("--presupuesto-ms", type=float, default=300, help="máximo acumulado para 'import main'")
+    parser.add_argument("--top", type=int, default=15, help="módulos más lentos a mostrar")
+    args = parser.parse_args()
+
+    try:
+        tiempos = medir_importacion()
+    except RuntimeError as e:
+        print(f"❌ No se pudo importar 'main': {e}")
+        return 1
+
+    total_ms = tiempos["main"][1] / 1000
+    print(f"Importar 'main': {total_ms:.1f} ms (presupuesto {args.presupuesto_ms:.0f} ms)\n")
+    print(f"{'acumulado ms':>13} {'propio ms':>10}  módulo")
+    for nombre, (propio, acumulado) in sorted(tiempos.items(), key=lambda t: -t[1][1])[:args.top]:
+        print(f"{acumulado / 1000:13.1f} {propio / 1000:10.1f}  {nombre}")
+
+    cargados = [m for m in PROHIBIDOS if any(n == m or n.startswith(m + ".") for n in tiempos)]
+    correcto = True
+    if cargados:
+        print(f"\n❌ Se cargaron módulos que deberían ser diferidos: {', '.join(cargados)}")
+        correcto = False
+    if total_ms > args.presupuesto_ms:
+        print(f"\n❌ El arranque supera el presupuesto en {total_ms - args.presupuesto_ms:.1f} ms")
+        correcto = False
+    if correcto:
+        print("\n✅ Arranque del login dentro del presupuesto")
+    return 0 if correcto else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,5 @@
 import tkinter as tk
-from tkinter import ttk
+from tkinter import ttk, font as tkfont
 
 class UIHelper:
     # Colores para modo oscuro
@@ -61,4 +61,116 @@ class UIHelper:
             boton.config(bg=bg_color)
             
         boton.bind("<Enter>", on_enter)
-        boton.bind("<Leave>", on_leave)
\ No newline at end of file
+        boton.bind("<Leave>", on_leave)
+
+
+class ListaVirtual(tk.Frame):
+    """Listbox virtualizada: sólo formatea y dibuja las filas que caben en pantalla"""
+
+    def __init__(self, master, total=0, obtener_fila=None, **opciones_lista):
+        super().__init__(master, bg=opciones_lista.get("bg", UIHelper.COLOR_TERCIARIO))
+        self.total = total
+        self.obtener_fila = obtener_fila or (lambda indice: "")
+        self.inicio = 0
+        self.seleccion = None
+
+        self.scrollbar = ttk.Scrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.lista = tk.Listbox(self, exportselection=False, **opciones_lista)
+        self.lista.pack(side="left", fill="both", expand=True)
+        self._alto_linea = self._medir_linea()
+
+        self.lista.bind("<Configure>", self._on_configure)
+        self.lista.bind("<<ListboxSelect>>", self._on_select)
+        self.lista.bind("<MouseWheel>", self._on_rueda)
+        self.lista.bind("<Button-4>", lambda e: self.desplazar(-3))
+        self.lista.bind("<Button-5>", lambda e: self.desplazar(3))
+        self.lista.bind("<Up>", lambda e: self._mover_seleccion(-1))
+        self.lista.bind("<Down>", lambda e: self._mover_seleccion(1))
+        self.lista.bind("<Prior>", lambda e: self.desplazar(-self.filas_visibles()))
+        self.lista.bind("<Next>", lambda e: self.desplazar(self.filas_visibles()))
+
+    def establecer(self, total, obtener_fila=None):
+        """Cambia el origen de datos y vuelve al principio"""
+        self.total = total
+        if obtener_fila is not None:
+            self.obtener_fila = obtener_fila
+        self.inicio = 0
+        self.seleccion = None
+        self.refrescar()
+
+    def bind_filas(self, secuencia, callback):
+        """Enlaza un evento sobre las filas (p. ej. doble clic)"""
+        self.lista.bind(secuencia, callback)
+
+    def curselection(self):
+        """Índice absoluto seleccionado, con la misma forma que Listbox.curselection()"""
+        return () if self.seleccion is None else (self.seleccion,)
+
+    def _medir_linea(self):
+        return tkfont.Font(font=self.lista.cget("font")).metrics("linespace") + 1
+
+    def filas_visibles(self):
+        return max(1, self.lista.winfo_height() // self._alto_linea)
+
+    def desplazar(self, filas):
+        self._ir_a(self.inicio + filas)
+        return "break"
+
+    def refrescar(self):
+        """Redibuja la ventana visible pidiendo sólo esas filas a obtener_fila"""
+        visibles = self.filas_visibles()
+        self.inicio = max(0, min(self.inicio, self.total - visibles))
+        fin = min(self.total, self.inicio + visibles)
+
+        self.lista.delete(0, tk.END)
+        for indice in range(self.inicio, fin):
+            self.lista.insert(tk.END, self.obtener_fila(indice))
+        if self.seleccion is not None and self.inicio <= self.seleccion < fin:
+            self.lista.selection_set(self.seleccion - self.inicio)
+
+        if self.total:
+            self.scrollbar.set(self.inicio / self.total, fin / self.total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _ir_a(self, inicio):
+        inicio = max(0, min(inicio, self.total - self.filas_visibles()))
+        if inicio != self.inicio:
+            self.inicio = inicio
+            self.refrescar()
+
+    def _on_configure(self, event):
+        # Sólo al cambiar de tamaño (o de fuente): el desplazamiento reutiliza la medida
+        self._alto_linea = self._medir_linea()
+        self.refrescar()
+
+    def _on_scrollbar(self, accion, cantidad, unidad=None):
+        if accion == "moveto":
+            self._ir_a(int(float(cantidad) * self.total))
+        elif accion == "scroll":
+            paso = self.filas_visibles() if unidad == "pages" else 1
+            self.desplazar(int(cantidad) * paso)
+
+    def _on_rueda(self, event):
+        return self.desplazar(-1 if event.delta > 0 else 1)
+
+    def _on_select(self, event):
+        seleccion = self.lista.curselection()
+        if seleccion:
+            self.seleccion = self.inicio + seleccion[0]
+
+    def _mover_seleccion(self, delta):
+        if not self.total:
+            return "break"
+        actual = self.inicio if self.seleccion is None else self.seleccion + delta
+        self.seleccion = max(0, min(actual, self.total - 1))
+        visibles = self.filas_visibles()
+        if self.seleccion < self.inicio:
+            self.inicio = self.seleccion
+        elif self.seleccion >= self.inicio + visibles:
+            self.inicio = self.seleccion - visibles + 1
+        self.refrescar()
+        self.lista.event_generate("<<ListboxSelect>>")
+        return "break"
@@ -1,15 +1,19 @@
 import tkinter as tk
 from tkinter import ttk
-from ui_helper import UIHelper
+from ui_helper import UIHelper, ListaVirtual
+from models.Catalogo import formatear_precio
 
 class PuntoVentaView:
     def __init__(self, root, controller):
         self.root = root
         self.controller = controller
+        self.entry_busqueda = None
         self.combo_area = None
         self.lista_productos = None
-        self.texto_cuenta = None
+        self.lista_cuenta = None
+        self.lbl_total = None
         self.btn_resumen = None
+        self.lbl_estado = None
 
     def crear_vista_principal(self):
         # Configurar estilo oscuro para ttk
@@ -32,6 +36,22 @@ class PuntoVentaView:
         frame_izq = tk.Frame(frame_principal, bg=UIHelper.COLOR_SECUNDARIO, bd=1, relief="solid")
         frame_izq.pack(side="left", fill="both", expand=True, padx=10, pady=5)
 
+        lbl_busqueda = tk.Label(frame_izq, text="Buscar producto o código:",
+                                font=("Segoe UI", 12, "bold"),
+                                bg=UIHelper.COLOR_SECUNDARIO,
+                                fg=UIHelper.COLOR_TEXTO)
+        lbl_busqueda.pack(anchor="w", padx=10, pady=(10, 0))
+
+        self.entry_busqueda = tk.Entry(frame_izq,
+                                       bg=UIHelper.COLOR_TERCIARIO,
+                                       fg=UIHelper.COLOR_TEXTO,
+                                       insertbackground=UIHelper.COLOR_TEXTO,
+                                       relief="flat",
+                                       bd=0)
+        self.entry_busqueda.pack(fill="x", padx=10, pady=5)
+        self.entry_busqueda.bind("<KeyRelease>", self.controller.on_busqueda)
+        self.entry_busqueda.bind("<Return>", self.controller.on_codigo_ingresado)
+
         lbl_area = tk.Label(frame_izq, text="Seleccionar área:", 
                            font=("Segoe UI", 12, "bold"), 
                            bg=UIHelper.COLOR_SECUNDARIO, 
@@ -48,25 +68,18 @@ class PuntoVentaView:
                                 fg=UIHelper.COLOR_TEXTO)
         lbl_productos.pack(anchor="w", padx=10, pady=(10, 0))
 
-        frame_lista = tk.Frame(frame_izq, bg=UIHelper.COLOR_SECUNDARIO)
-        frame_lista.pack(fill="both", expand=True, padx=10, pady=5)
-
-        scrollbar = ttk.Scrollbar(frame_lista)
-        scrollbar.pack(side="right", fill="y")
-
-        self.lista_productos = tk.Listbox(frame_lista, 
-                                         yscrollcommand=scrollbar.set, 
-                                         height=10, 
-                                         font=("Segoe UI", 10),
-                                         bg=UIHelper.COLOR_TERCIARIO,
-                                         fg=UIHelper.COLOR_TEXTO,
-                                         selectbackground=UIHelper.COLOR_ACENTO,
-                                         relief="flat",
-                                         bd=0)
-        self.lista_productos.pack(fill="both", expand=True)
-        self.lista_productos.bind("<Double-Button-1>", self.controller.on_producto_selected)
-
-        scrollbar.config(command=self.lista_productos.yview)
+        # Lista virtualizada: sólo se formatean y dibujan las filas visibles del área
+        self.lista_productos = ListaVirtual(frame_izq,
+                                            height=10,
+                                            font=("Segoe UI", 10),
+                                            bg=UIHelper.COLOR_TERCIARIO,
+                                            fg=UIHelper.COLOR_TEXTO,
+                                            selectbackground=UIHelper.COLOR_ACENTO,
+                                            relief="flat",
+                                            bd=0)
+        self.lista_productos.pack(fill="both", expand=True, padx=10, pady=5)
+        self.lista_productos.bind_filas("<Double-Button-1>", self.controller.on_producto_selected)
+        self.lista_productos.bind_filas("<Return>", self.controller.on_producto_selected)
 
         # Frame derecho
         frame_der = tk.Frame(frame_principal, bg=UIHelper.COLOR_SECUNDARIO, bd=1, relief="solid")
@@ -78,17 +91,44 @@ class PuntoVentaView:
                              fg=UIHelper.COLOR_TEXTO)
         lbl_cuenta.pack(anchor="w", padx=10, pady=10)
 
-        self.texto_cuenta = tk.Text(frame_der, 
-                                   height=12, 
-                                   state="disabled", 
-                                   bg=UIHelper.COLOR_TERCIARIO,
-                                   fg=UIHelper.COLOR_TEXTO,
-                                   font=("Consolas", 10),
-                                   relief="flat",
-                                   bd=0,
-                                   padx=10,
-                                   pady=10)
-        self.texto_cuenta.pack(fill="both", expand=True, padx=10, pady=5)
+        frame_cuenta = tk.Frame(frame_der, bg=UIHelper.COLOR_SECUNDARIO)
+        frame_cuenta.pack(fill="both", expand=True, padx=10, pady=5)
+
+        scrollbar_cuenta = ttk.Scrollbar(frame_cuenta)
+        scrollbar_cuenta.pack(side="right", fill="y")
+
+        # Una fila por línea de la cuenta: cada cambio repinta sólo su fila
+        self.lista_cuenta = tk.Listbox(frame_cuenta,
+                                       yscrollcommand=scrollbar_cuenta.set,
+                                       height=12,
+                                       exportselection=False,
+                                       font=("Consolas", 10),
+                                       bg=UIHelper.COLOR_TERCIARIO,
+                                       fg=UIHelper.COLOR_TEXTO,
+                                       selectbackground=UIHelper.COLOR_ACENTO,
+                                       relief="flat",
+                                       bd=0)
+        self.lista_cuenta.pack(fill="both", expand=True)
+        self.lista_cuenta.bind("<Delete>", lambda e: self.controller.quitar_producto())
+        scrollbar_cuenta.config(command=self.lista_cuenta.yview)
+
+        self.lbl_total = tk.Label(frame_der, text="Total: $0.00",
+                                  font=("Consolas", 12, "bold"),
+                                  bg=UIHelper.COLOR_SECUNDARIO,
+                                  fg=UIHelper.COLOR_TEXTO,
+                                  anchor="e")
+        self.lbl_total.pack(fill="x", padx=10)
+
+        frame_cantidad = tk.Frame(frame_der, bg=UIHelper.COLOR_SECUNDARIO)
+        frame_cantidad.pack(fill="x", padx=10, pady=(5, 10))
+
+        for texto, comando in [("➕", self.controller.aumentar_cantidad),
+                               ("➖", self.controller.disminuir_cantidad),
+                               ("✏️ Cantidad", self.controller.cambiar_cantidad),
+                               ("🗑 Quitar", self.controller.quitar_producto)]:
+            btn = tk.Button(frame_cantidad, text=texto, command=comando)
+            UIHelper.estilizar_boton(btn, bg=UIHelper.COLOR_TERCIARIO, hover=UIHelper.COLOR_ACENTO)
+            btn.pack(side="left", padx=(0, 5))
 
         # Botones
         frame_botones = tk.Frame(self.root, bg=UIHelper.COLOR_PRIMARIO)
@@ -102,22 +142,64 @@ class PuntoVentaView:
         UIHelper.estilizar_boton(self.btn_resumen)
         self.btn_resumen.pack(side="right", padx=10)
 
+        self.lbl_estado = tk.Label(self.root, text="",
+                                   font=("Segoe UI", 10),
+                                   bg=UIHelper.COLOR_PRIMARIO,
+                                   fg=UIHelper.COLOR_TEXTO_SECUNDARIO)
+        self.lbl_estado.pack(pady=(0, 10))
+
     def actualizar_combo_areas(self, nombres_areas):
         self.combo_area['values'] = nombres_areas
         if nombres_areas:
             self.combo_area.current(0)
 
-    def actualizar_lista_productos(self, productos):
-        self.lista_productos.delete(0, tk.END)
-        for producto in productos:
-            self.lista_productos.insert(tk.END, f"{producto['nombre']} - ${producto['precio']:.2f}")
-
-    def actualizar_cuenta(self, cuenta_actual, total_actual):
-        self.texto_cuenta.config(state="normal")
-        self.texto_cuenta.delete(1.0, tk.END)
-
-        for producto_id, datos in cuenta_actual.items():
-            self.texto_cuenta.insert(tk.END, f"{datos['nombre']} x{datos['cantidad']} - ${datos['precio'] * datos['cantidad']:.2f}\n")
-
-        self.texto_cuenta.insert(tk.END, f"\nTotal: ${total_actual:.2f}")
-        self.texto_cuenta.config(state="disabled")
\ No newline at end of file
+    def obtener_busqueda(self):
+        return self.entry_busqueda.get().strip()
+
+    def limpiar_busqueda(self):
+        self.entry_busqueda.delete(0, tk.END)
+
+    def actualizar_lista_productos(self, ids_productos, catalogo):
+        """Muestra una secuencia de ids del catálogo; el texto de cada fila se genera al dibujarla"""
+        self.lista_productos.establecer(
+            len(ids_productos),
+            lambda indice: catalogo.etiqueta(ids_productos[indice])
+        )
+
+    @staticmethod
+    def _formatear_linea(linea):
+        return f"{linea.nombre} x{linea.cantidad} - {formatear_precio(linea.importe)}"
+
+    def actualizar_cuenta(self, cuenta):
+        """Pinta la cuenta completa (sólo al abrir la ventana)"""
+        self.lista_cuenta.delete(0, tk.END)
+        for indice in range(len(cuenta)):
+            self.lista_cuenta.insert(tk.END, self._formatear_linea(cuenta.linea(indice)))
+        self.lbl_total.config(text=f"Total: {formatear_precio(cuenta.total)}")
+
+    def aplicar_cambio_cuenta(self, evento, indice, dato):
+        """Aplica un único cambio de la cuenta sobre la fila afectada"""
+        if evento == "agregada":
+            self.lista_cuenta.insert(indice, self._formatear_linea(dato))
+            self.lista_cuenta.see(indice)
+        elif evento == "modificada":
+            seleccionada = indice in self.lista_cuenta.curselection()
+            self.lista_cuenta.delete(indice)
+            self.lista_cuenta.insert(indice, self._formatear_linea(dato))
+            if seleccionada:
+                self.lista_cuenta.selection_set(indice)
+            self.lista_cuenta.see(indice)
+        elif evento == "eliminada":
+            self.lista_cuenta.delete(indice)
+        elif evento == "vaciada":
+            self.lista_cuenta.delete(0, tk.END)
+        elif evento == "total":
+            self.lbl_total.config(text=f"Total: {formatear_precio(dato)}")
+
+    def linea_seleccionada(self):
+        seleccion = self.lista_cuenta.curselection()
+        return seleccion[0] if seleccion else None
+
+    def mostrar_estado(self, mensaje):
+        if self.lbl_estado:
+            self.lbl_estado.config(text=mensaje)
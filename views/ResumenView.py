@@ -0,0 +1,48 @@
+import tkinter as tk
+from tkinter import scrolledtext
+from ui_helper import UIHelper, ListaVirtual
+
+class ResumenView:
+    def __init__(self, root, controller):
+        self.root = root
+        self.controller = controller
+        self.texto_resumen = None
+        self.lista_tickets = None
+
+    def crear_vista(self, titulo, resumen, total_tickets, obtener_fila):
+        """Muestra los totales del día y el detalle de tickets virtualizado"""
+        self.root.title(titulo)
+        self.root.geometry("600x550")
+        self.root.config(bg=UIHelper.COLOR_PRIMARIO)
+
+        self.texto_resumen = scrolledtext.ScrolledText(self.root,
+                                                       height=12,
+                                                       wrap=tk.WORD,
+                                                       font=("Consolas", 10),
+                                                       bg=UIHelper.COLOR_TERCIARIO,
+                                                       fg=UIHelper.COLOR_TEXTO,
+                                                       relief="flat",
+                                                       padx=10,
+                                                       pady=10)
+        self.texto_resumen.pack(fill="x", padx=10, pady=(10, 5))
+        self.texto_resumen.insert(1.0, resumen)
+        self.texto_resumen.config(state="disabled")
+
+        lbl_detalle = tk.Label(self.root,
+                               text=f"Detalle de clientes ({total_tickets}):",
+                               font=("Segoe UI", 11, "bold"),
+                               bg=UIHelper.COLOR_PRIMARIO,
+                               fg=UIHelper.COLOR_TEXTO)
+        lbl_detalle.pack(anchor="w", padx=10, pady=(5, 0))
+
+        # Sólo se piden al controlador las filas visibles; el resto se lee al hacer scroll
+        self.lista_tickets = ListaVirtual(self.root,
+                                          total=total_tickets,
+                                          obtener_fila=obtener_fila,
+                                          font=("Consolas", 10),
+                                          bg=UIHelper.COLOR_TERCIARIO,
+                                          fg=UIHelper.COLOR_TEXTO,
+                                          selectbackground=UIHelper.COLOR_ACENTO,
+                                          relief="flat",
+                                          bd=0)
+        self.lista_tickets.pack(fill="both", expand=True, padx=10, pady=(5, 10))
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 from ui_helper import UIHelper
+from analisis.motores import MOTORES, FUENTES
 
 class SparkView:
     def __init__(self, root, controller):
@@ -10,6 +11,12 @@ class SparkView:
         self.btn_test = None
         self.btn_analizar = None
         self.btn_exportar = None
+        self.btn_cancelar = None
+        self.var_limite_seccion = None
+        self.combo_motor = None
+        self.combo_fuente = None
+        self.entry_desde = None
+        self.entry_hasta = None
         self.progress_bar = None
         self.lbl_estado = None
         self.lbl_progreso_detalle = None  # Nueva etiqueta para mostrar el paso actual
@@ -55,6 +62,76 @@ class SparkView:
         UIHelper.estilizar_boton(self.btn_exportar, bg=UIHelper.COLOR_ACENTO, hover="#2980b9")
         self.btn_exportar.pack(side="left", padx=5)
 
+        # Botón de cancelación: sólo activo mientras hay un análisis en curso
+        self.btn_cancelar = tk.Button(btn_frame,
+                                      text="⛔ Cancelar",
+                                      command=self.controller.cancelar_analisis,
+                                      width=12,
+                                      state="disabled")
+        UIHelper.estilizar_boton(self.btn_cancelar, bg=UIHelper.COLOR_PELIGRO, hover="#b02a30")
+        self.btn_cancelar.pack(side="left", padx=5)
+
+        # Límite de tiempo por sección (0 = el de cada sección por defecto)
+        self.var_limite_seccion = tk.StringVar(value="0")
+        tk.Spinbox(btn_frame, from_=0, to=3600, increment=30, width=6,
+                   textvariable=self.var_limite_seccion,
+                   font=("Segoe UI", 10)).pack(side="right", padx=5)
+        tk.Label(btn_frame, text="Límite por sección (s):",
+                 font=("Segoe UI", 10),
+                 bg=UIHelper.COLOR_PRIMARIO,
+                 fg=UIHelper.COLOR_TEXTO_SECUNDARIO).pack(side="right")
+
+        # Periodo a analizar: sólo esos tickets salen de MongoDB
+        periodo_frame = tk.Frame(main_frame, bg=UIHelper.COLOR_PRIMARIO)
+        periodo_frame.pack(pady=(0, 10), fill="x")
+
+        tk.Label(periodo_frame, text="Desde (AAAA-MM-DD):",
+                 font=("Segoe UI", 10),
+                 bg=UIHelper.COLOR_PRIMARIO,
+                 fg=UIHelper.COLOR_TEXTO_SECUNDARIO).pack(side="left", padx=(5, 5))
+        self.entry_desde = tk.Entry(periodo_frame, width=12,
+                                    bg=UIHelper.COLOR_TERCIARIO,
+                                    fg=UIHelper.COLOR_TEXTO,
+                                    insertbackground=UIHelper.COLOR_TEXTO,
+                                    relief="flat",
+                                    bd=0)
+        self.entry_desde.pack(side="left", padx=(0, 15))
+
+        tk.Label(periodo_frame, text="Hasta (AAAA-MM-DD):",
+                 font=("Segoe UI", 10),
+                 bg=UIHelper.COLOR_PRIMARIO,
+                 fg=UIHelper.COLOR_TEXTO_SECUNDARIO).pack(side="left", padx=(0, 5))
+        self.entry_hasta = tk.Entry(periodo_frame, width=12,
+                                    bg=UIHelper.COLOR_TERCIARIO,
+                                    fg=UIHelper.COLOR_TEXTO,
+                                    insertbackground=UIHelper.COLOR_TEXTO,
+                                    relief="flat",
+                                    bd=0)
+        self.entry_hasta.pack(side="left")
+
+        # Motor de análisis: 'auto' elige NumPy o Spark según el número de tickets
+        self.combo_motor = ttk.Combobox(periodo_frame, state="readonly", width=8, values=MOTORES)
+        self.combo_motor.set(MOTORES[0])
+        self.combo_motor.pack(side="right", padx=5)
+        tk.Label(periodo_frame, text="Motor:",
+                 font=("Segoe UI", 10),
+                 bg=UIHelper.COLOR_PRIMARIO,
+                 fg=UIHelper.COLOR_TEXTO_SECUNDARIO).pack(side="right")
+
+        # Origen de los tickets: 'clientes' en MongoDB o la instantánea Parquet exportada
+        self.combo_fuente = ttk.Combobox(periodo_frame, state="readonly", width=8, values=FUENTES)
+        self.combo_fuente.set(FUENTES[0])
+        self.combo_fuente.pack(side="right", padx=5)
+        tk.Label(periodo_frame, text="Datos:",
+                 font=("Segoe UI", 10),
+                 bg=UIHelper.COLOR_PRIMARIO,
+                 fg=UIHelper.COLOR_TEXTO_SECUNDARIO).pack(side="right")
+
+        tk.Label(periodo_frame, text="(vacío = sin límite)",
+                 font=("Segoe UI", 9),
+                 bg=UIHelper.COLOR_PRIMARIO,
+                 fg=UIHelper.COLOR_TEXTO_SECUNDARIO).pack(side="left", padx=10)
+
         # Frame para el área de resultados
         result_frame = tk.Frame(main_frame, bg=UIHelper.COLOR_SECUNDARIO, bd=1, relief="solid")
         result_frame.pack(fill="both", expand=True, pady=10)
@@ -135,7 +212,6 @@ class SparkView:
             self.actualizar_estado(mensaje)
             self.actualizar_detalle_progreso("Preparando...")
             self.actualizar_porcentaje(0)
-            self.progress_bar.update()
 
     def avanzar_progreso(self, paso_actual, total_pasos, mensaje_detalle=""):
         """Avanzar un paso con información detallada"""
@@ -145,7 +221,18 @@ class SparkView:
             self.actualizar_porcentaje(porcentaje)
             if mensaje_detalle:
                 self.actualizar_detalle_progreso(mensaje_detalle)
-            self.progress_bar.update()
+
+    def mostrar_avance_spark(self, estado, texto):
+        """Barra y detalle según las tareas completadas de la sección en curso"""
+        if self.progress_bar:
+            fraccion = 0
+            if estado['tareas_totales']:
+                fraccion = estado['tareas_completadas'] / estado['tareas_totales']
+            porcentaje = (estado['paso'] - 1 + fraccion) / estado['total_pasos'] * 100
+            self.progress_bar["value"] = porcentaje
+            self.actualizar_porcentaje(porcentaje)
+        if self.lbl_progreso_detalle:
+            self.lbl_progreso_detalle.config(text=texto)
 
     def actualizar_detalle_progreso(self, mensaje):
         """Actualizar el mensaje detallado del progreso"""
@@ -164,7 +251,6 @@ class SparkView:
             self.actualizar_porcentaje(100)
             self.actualizar_detalle_progreso("Completado")
             self.actualizar_estado(mensaje)
-            self.progress_bar.update()
 
     def limpiar_resultados(self):
         if self.resultado_area:
@@ -201,6 +287,40 @@ class SparkView:
             self.btn_exportar.config(state="normal")
         self.actualizar_estado("Análisis completado")
 
+    def mostrar_parcial(self, texto, mensaje):
+        """Muestra lo calculado hasta ahora mientras el análisis sigue en curso"""
+        if self.resultado_area:
+            self.resultado_area.delete(1.0, tk.END)
+            self.resultado_area.insert(tk.END, texto)
+            self.resultado_area.insert(tk.END, f"\n⏳ {mensaje}")
+        self.actualizar_estado(mensaje)
+
+    def obtener_periodo(self):
+        """Textos de las fechas 'desde' y 'hasta' tal como los escribió el usuario"""
+        if not self.entry_desde:
+            return "", ""
+        return self.entry_desde.get().strip(), self.entry_hasta.get().strip()
+
+    def obtener_motor(self):
+        """Motor elegido en el desplegable ('auto' si aún no existe)"""
+        return self.combo_motor.get() if self.combo_motor else MOTORES[0]
+
+    def obtener_fuente(self):
+        """Origen de datos elegido ('mongo' si aún no existe el desplegable)"""
+        return self.combo_fuente.get() if self.combo_fuente else FUENTES[0]
+
+    def obtener_limite_seccion(self):
+        """Segundos indicados por el usuario, o None si no hay un valor positivo válido"""
+        try:
+            limite = int(self.var_limite_seccion.get())
+        except (AttributeError, ValueError):
+            return None
+        return limite if limite > 0 else None
+
+    def activar_cancelacion(self, activa):
+        if self.btn_cancelar:
+            self.btn_cancelar.config(state="normal" if activa else "disabled")
+
     def mostrar_progreso(self, mensaje):
         self.limpiar_resultados()
         if self.resultado_area: